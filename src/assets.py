@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import shutil
+
+from discover import IGNORE_PATTERNS, walk_files
+from images import is_image, variant_path
+from manifest import file_hash, remove_output
+from output import open_output
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# names browsers and hosts ask for directly keep them when fingerprinting
+UNFINGERPRINTED = {"favicon.ico", "robots.txt", "CNAME", ".nojekyll"}
+FINGERPRINT_LENGTH = 12
+
+# ioctl that asks copy-on-write filesystems (btrfs, xfs) to share extents
+FICLONE = 0x40049409
+
+
+def sync_tree(src, dst, manifest=None, compare="mtime", link=False, fingerprint=False, images=None, ignore=IGNORE_PATTERNS):
+    # Copies only assets that changed since the last sync and prunes the ones
+    # that were deleted from src. Returns {"copied", "linked", "skipped", "removed"}.
+    # With fingerprint, each asset is installed under a name carrying its
+    # content hash and the manifest entry records that name as "output".
+    # With an ImageCache, images are installed optimized, along with their
+    # resized variants, and the entry records their sizes under "image".
+    previous = manifest.assets if manifest is not None else {}
+    # the manifest remembers removed outputs for the link check
+    remove = manifest.remove_output if manifest is not None else remove_output
+    assets = {}
+    counts = {"copied": 0, "linked": 0, "skipped": 0, "removed": 0}
+    if fingerprint:
+        compare = "hash"
+    files = []
+    for found in walk_files(src, ignore=ignore):
+        src_path, rel_path = found.path, found.rel_path
+        src_stat = found.stat()
+        entry = {"size": src_stat.st_size, "mtime": src_stat.st_mtime_ns}
+        old = previous.get(rel_path)
+        if compare == "hash" or (images is not None and is_image(rel_path)):
+            # only rehash files whose size or mtime moved
+            if old is not None and old.get("hash") and old["size"] == entry["size"] and old["mtime"] == entry["mtime"]:
+                entry["hash"] = old["hash"]
+            else:
+                entry["hash"] = file_hash(src_path)
+        files.append((src_path, rel_path, entry, old))
+    records = {}
+    if images is not None:
+        records = images.process_all([(src_path, entry["hash"]) for src_path, rel_path, entry, old in files if is_image(rel_path)])
+    for src_path, rel_path, entry, old in files:
+        # output path -> the file installed there
+        installs = {}
+        output = fingerprint_path(rel_path, entry["hash"]) if fingerprint else rel_path
+        if fingerprint:
+            entry["output"] = output
+        installs[output] = src_path
+        record = records.get(entry.get("hash")) if is_image(rel_path) else None
+        if record is not None and record["width"] is not None:
+            entry["image"] = {"width": record["width"], "height": record["height"], "variants": []}
+            if record["optimized"]:
+                installs[output] = images.blob_path(record["optimized"])
+            for width, height, blob in record["variants"]:
+                variant = variant_path(rel_path, width)
+                if fingerprint:
+                    variant = fingerprint_path(variant, entry["hash"])
+                entry["image"]["variants"].append([width, height, variant])
+                installs[variant] = images.blob_path(blob)
+        assets[rel_path] = entry
+        if old is not None:
+            # the previous fingerprint, the plain name, or dropped variants
+            for stale in asset_outputs(rel_path, old):
+                if stale not in installs:
+                    remove(os.path.join(dst, stale), dst)
+            if old.get("output", rel_path) != output or ("image" in old) != ("image" in entry):
+                old = None
+        for out_path, install_path in installs.items():
+            dst_path = os.path.join(dst, out_path)
+            if not needs_copy(os.stat(install_path), dst_path, entry, old, compare):
+                counts["skipped"] += 1
+                continue
+            if install_file(install_path, dst_path, link):
+                counts["linked"] += 1
+            else:
+                counts["copied"] += 1
+    for rel_path in sorted(set(previous) - set(assets)):
+        for stale in asset_outputs(rel_path, previous[rel_path]):
+            remove(os.path.join(dst, stale), dst)
+        counts["removed"] += 1
+    if manifest is not None:
+        manifest.assets = assets
+    return counts
+
+
+def asset_outputs(rel_path, entry):
+    # every file a synced asset put in dst
+    outputs = [entry.get("output", rel_path)]
+    for width, height, variant in entry.get("image", {}).get("variants", []):
+        outputs.append(variant)
+    return outputs
+
+
+def fingerprint_path(rel_path, digest):
+    # css/site.css -> css/site.3fa4c2e1b0a9.css
+    if os.path.basename(rel_path) in UNFINGERPRINTED:
+        return rel_path
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def split_suffix(url):
+    end = len(url)
+    for mark in "?#":
+        index = url.find(mark, 0, end)
+        if index != -1:
+            end = index
+    return url[:end], url[end:]
+
+
+class AssetMap:
+    # Maps site URLs of static assets to their fingerprinted URLs, built from
+    # the manifest's asset entries after a fingerprinting sync.
+    def __init__(self, static_dir, assets):
+        self.urls = {}
+        self.images = {}
+        self.sources = {}
+        for rel_path, entry in sorted(assets.items()):
+            if "output" not in entry and "image" not in entry:
+                continue
+            url = "/" + rel_path.replace(os.sep, "/")
+            if "output" in entry:
+                self.urls[url] = "/" + entry["output"].replace(os.sep, "/")
+            if "image" in entry:
+                self.images[url] = entry["image"]
+            self.sources[url] = (os.path.normpath(os.path.join(static_dir, rel_path)), entry["hash"])
+        self.key = hashlib.sha256(json.dumps([self.urls, self.images], sort_keys=True).encode()).hexdigest()[:16]
+
+    def url(self, url):
+        # keeps any ?query or #fragment on the rewritten URL
+        path, suffix = split_suffix(url)
+        mapped = self.urls.get(path)
+        if mapped is None:
+            return url
+        return mapped + suffix
+
+    def mode(self):
+        # what the map changes in pages, for invalidating them when it differs
+        return [name for name, used in (("fingerprint", self.urls), ("images", self.images)) if used]
+
+    def image_props(self, url, basepath="/"):
+        image = self.images.get(split_suffix(url)[0])
+        if image is None:
+            return {}
+        props = {"width": str(image["width"]), "height": str(image["height"])}
+        if image["variants"]:
+            candidates = [f"{basepath}{variant.replace(os.sep, '/')} {width}w" for width, height, variant in image["variants"]]
+            candidates.append(f"{basepath}{self.url(url)[1:]} {image['width']}w")
+            props["srcset"] = ", ".join(candidates)
+        return props
+
+    def deps(self, urls):
+        # {static source: hash} for the assets among urls
+        deps = {}
+        for url in urls:
+            source = self.sources.get(split_suffix(url)[0])
+            if source is not None:
+                deps[source[0]] = source[1]
+        return deps
+
+    def hashes(self):
+        return dict(self.sources.values())
+
+    def write_json(self, path):
+        with open_output(path) as f:
+            json.dump(self.urls, f, indent=1, sort_keys=True)
+            f.write("\n")
+
+    def __repr__(self):
+        return f"AssetMap({len(self.urls)} assets, {self.key})"
+
+
+def sync_file(src, dst, rel_path, manifest=None, link=False):
+    # Brings a single asset up to date: installs it, or removes it from dst
+    # when it is gone from src. Returns True if the asset still exists.
+    src_path = os.path.join(src, rel_path)
+    dst_path = os.path.join(dst, rel_path)
+    if not os.path.exists(src_path):
+        if manifest is not None:
+            manifest.remove_output(dst_path, dst)
+            manifest.assets.pop(rel_path, None)
+        else:
+            remove_output(dst_path, dst)
+        return False
+    install_file(src_path, dst_path, link)
+    if manifest is not None:
+        src_stat = os.stat(src_path)
+        entry = {"size": src_stat.st_size, "mtime": src_stat.st_mtime_ns}
+        if "hash" in manifest.assets.get(rel_path, {}):
+            entry["hash"] = file_hash(src_path)
+        manifest.assets[rel_path] = entry
+    return True
+
+
+def needs_copy(src_stat, dst_path, entry, old, compare):
+    try:
+        dst_stat = os.stat(dst_path)
+    except FileNotFoundError:
+        return True
+    if (dst_stat.st_dev, dst_stat.st_ino) == (src_stat.st_dev, src_stat.st_ino):
+        return False
+    if dst_stat.st_size != src_stat.st_size:
+        return True
+    if compare == "hash":
+        return old is None or old.get("hash") != entry["hash"]
+    return dst_stat.st_mtime_ns != src_stat.st_mtime_ns
+
+
+def install_file(src_path, dst_path, link=False):
+    # Returns True when dst shares storage with src (reflink or hardlink).
+    # Linking is opt-in: a hardlinked output is the source file itself, so
+    # anything writing into it in place would change the source too.
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    # shards on one host may install the same asset at the same time
+    tmp_path = f"{dst_path}.tmp{os.getpid()}"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    if link:
+        if reflink(src_path, tmp_path):
+            os.replace(tmp_path, dst_path)
+            return True
+        try:
+            os.link(src_path, tmp_path)
+            os.replace(tmp_path, dst_path)
+            return True
+        except OSError:
+            # different filesystem or no hardlink support
+            pass
+    shutil.copy2(src_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+    return False
+
+
+def reflink(src_path, dst_path):
+    if fcntl is None:
+        return False
+    try:
+        with open(src_path, "rb") as s, open(dst_path, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    except OSError:
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        return False
+    shutil.copystat(src_path, dst_path)
+    return True
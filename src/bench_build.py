@@ -0,0 +1,229 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_corpus import add_corpus_args, write_corpus
+from build import generate_pages_recursive
+from links import LinkResolver
+from main import copy_tree
+from manifest import Manifest
+from markdown_blocks import markdown_to_document
+from template import compile_template
+from watch import Watcher
+
+STAGES = ["walk", "read", "parse", "serialize", "template", "write", "static", "build", "watch"]
+
+# marks a directory as a corpus this script wrote, which --keep may replace
+BENCH_MARKER = ".ssg-bench"
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+def time_stages(root, basepath, jobs):
+    content = os.path.join(root, "content")
+    out = os.path.join(root, "docs")
+    template_path = os.path.join(root, "template.html")
+    if os.path.exists(out):
+        shutil.rmtree(out)
+    timings = {}
+
+    start = time.perf_counter()
+    sources = []
+    for dirpath, dirs, files in os.walk(content):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(".md"):
+                sources.append(os.path.join(dirpath, file))
+    timings["walk"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    texts = []
+    for path in sources:
+        with open(path) as f:
+            texts.append(f.read())
+    timings["read"] = time.perf_counter() - start
+
+    resolver = LinkResolver(basepath)
+    start = time.perf_counter()
+    documents = [markdown_to_document(text, resolver) for text in texts]
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bodies = [document.node.to_html() for document in documents]
+    timings["serialize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(template_path) as f:
+        template = compile_template(f.read(), basepath)
+    pages = [
+        template.render({"Title": document.title, "Content": body, "Basepath": basepath})
+        for document, body in zip(documents, bodies)
+    ]
+    timings["template"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path, page in zip(sources, pages):
+        dest = os.path.join(out, os.path.splitext(os.path.relpath(path, content))[0] + ".html")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "w") as f:
+            f.write(page)
+    timings["write"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    copy_tree(os.path.join(root, "static"), out)
+    timings["static"] = time.perf_counter() - start
+
+    # the real build end to end, with its own output tree
+    build_out = os.path.join(root, "build")
+    if os.path.exists(build_out):
+        shutil.rmtree(build_out)
+    manifest = Manifest(os.path.join(root, "manifest.json"))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        copy_tree(os.path.join(root, "static"), build_out)
+        generate_pages_recursive(content, template_path, build_out, basepath, manifest, jobs=jobs)
+    timings["build"] = time.perf_counter() - start
+
+    # --watch edit-to-refresh latency: one page edited, then the poll that
+    # rebuilds it
+    watcher = Watcher(content, os.path.join(root, "static"), template_path, build_out, basepath, manifest, log=False)
+    with open(sources[0], "a") as f:
+        f.write("\n\nEdited.\n")
+    start = time.perf_counter()
+    watcher.poll()
+    timings["watch"] = time.perf_counter() - start
+    with open(sources[0], "w") as f:
+        f.write(texts[0])
+
+    return timings
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(runs):
+    stages = {}
+    for stage in STAGES:
+        samples = [run[stage] for run in runs]
+        stages[stage] = {
+            "min": min(samples),
+            "median": statistics.median(samples),
+            "max": max(samples),
+        }
+    return stages
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for stage, stats in results["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before is None or before["min"] == 0:
+            continue
+        ratio = stats["min"] / before["min"]
+        marker = ""
+        # a few milliseconds of jitter on a tiny stage is not a regression
+        if ratio > 1 + tolerance and stats["min"] - before["min"] > 0.002:
+            marker = "  REGRESSION"
+            regressions.append(stage)
+        print(f"{stage:>10} {before['min'] * 1000:>10.2f}ms -> {stats['min'] * 1000:>10.2f}ms {ratio:>6.2f}x{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each build stage over a synthetic corpus")
+    add_corpus_args(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=1, help="workers for the end-to-end build stage")
+    parser.add_argument("--basepath", default="/")
+    parser.add_argument("--keep", help="build the corpus in this new (or earlier --keep) directory and leave it there")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before a stage counts as a regression")
+    args = parser.parse_args()
+
+    root = args.keep or tempfile.mkdtemp(prefix="ssg-bench-")
+    marker = os.path.join(root, BENCH_MARKER)
+    if args.keep and os.path.isdir(root) and os.listdir(root) and not os.path.exists(marker):
+        # the old corpus is deleted below, so only ever reuse a bench directory
+        parser.error(f"--keep {root}: not a directory this benchmark created, refusing to overwrite it")
+    os.makedirs(root, exist_ok=True)
+    with open(marker, "w") as f:
+        f.write("corpus written by bench_build.py\n")
+    try:
+        if os.path.exists(os.path.join(root, "content")):
+            shutil.rmtree(os.path.join(root, "content"))
+        if os.path.exists(os.path.join(root, "static")):
+            shutil.rmtree(os.path.join(root, "static"))
+        content_bytes, static_bytes = write_corpus(args, root)
+        with open(os.path.join(root, "template.html"), "w") as f:
+            f.write(TEMPLATE)
+        runs = []
+        for _ in range(args.repeat):
+            runs.append(time_stages(root, args.basepath, args.jobs))
+    finally:
+        if not args.keep:
+            shutil.rmtree(root)
+
+    corpus = {
+        name: getattr(args, name)
+        for name in ["pages", "depth", "fanout", "blocks", "mix", "links", "images", "static_files", "static_size", "seed"]
+    }
+    corpus["content_bytes"] = content_bytes
+    corpus["static_bytes"] = static_bytes
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "jobs": args.jobs,
+        "corpus": corpus,
+        "stages": summarize(runs),
+    }
+    data = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        out = sys.stderr if not args.output else sys.stdout
+        with contextlib.redirect_stdout(out):
+            regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
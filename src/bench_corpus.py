@@ -0,0 +1,161 @@
+import argparse
+import os
+import random
+
+DEFAULT_MIX = {
+    "heading": 2,
+    "paragraph": 8,
+    "ulist": 2,
+    "olist": 1,
+    "code": 1,
+    "quote": 1,
+}
+
+WORDS = (
+    "the ring of power was forged in the fires of mount doom by sauron "
+    "who sought to rule the free peoples of middle earth elves dwarves and men "
+    "gathered at rivendell where elrond held council and the fellowship set out"
+).split()
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    if not text:
+        return mix
+    for item in text.split(","):
+        name, weight = item.split("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"unknown block kind: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+class CorpusWriter:
+    def __init__(self, seed=0, mix=None, links=0.3, images=0.05, blocks=40):
+        self.random = random.Random(seed)
+        self.mix = mix or dict(DEFAULT_MIX)
+        self.links = links
+        self.images = images
+        self.blocks = blocks
+
+    def words(self, low, high):
+        return " ".join(self.random.choice(WORDS) for _ in range(self.random.randint(low, high)))
+
+    def inline(self, low=6, high=30):
+        parts = []
+        for _ in range(self.random.randint(1, 4)):
+            parts.append(self.words(low // 2, high // 2))
+            roll = self.random.random()
+            if roll < self.images:
+                parts.append(f"![{self.words(1, 3)}](/images/img{self.random.randint(0, 9)}.png)")
+            elif roll < self.images + self.links:
+                parts.append(f"[{self.words(1, 4)}](/pages/p{self.random.randint(0, 999)})")
+            elif roll < 0.6:
+                parts.append(f"**{self.words(1, 3)}**")
+            elif roll < 0.75:
+                parts.append(f"_{self.words(1, 3)}_")
+            elif roll < 0.85:
+                parts.append(f"`{self.random.choice(WORDS)}`")
+        return " ".join(parts)
+
+    def block(self, kind):
+        if kind == "heading":
+            return "#" * self.random.randint(2, 4) + " " + self.words(2, 6)
+        if kind == "paragraph":
+            return "\n".join(self.inline() for _ in range(self.random.randint(1, 4)))
+        if kind == "ulist":
+            return "\n".join("- " + self.inline(2, 10) for _ in range(self.random.randint(2, 8)))
+        if kind == "olist":
+            return "\n".join(f"{i}. " + self.inline(2, 10) for i in range(1, self.random.randint(3, 9)))
+        if kind == "code":
+            body = "\n".join("    " + self.words(2, 8) for _ in range(self.random.randint(2, 12)))
+            return f"```\n{body}\n```"
+        if kind == "quote":
+            return "\n".join("> " + self.inline(4, 12) for _ in range(self.random.randint(1, 4)))
+        raise ValueError(f"unknown block kind: {kind}")
+
+    def page(self, title):
+        kinds = list(self.mix)
+        weights = [self.mix[kind] for kind in kinds]
+        blocks = [f"# {title}"]
+        for kind in self.random.choices(kinds, weights, k=self.blocks):
+            blocks.append(self.block(kind))
+        return "\n\n".join(blocks) + "\n"
+
+
+def page_path(root, index, depth, fanout):
+    parts = []
+    n = index
+    for _ in range(depth):
+        parts.append(f"section{n % fanout}")
+        n //= fanout
+    return os.path.join(root, *parts, f"page{index}.md")
+
+
+def generate_corpus(root, pages=100, depth=2, fanout=8, seed=0, mix=None, blocks=40, links=0.3, images=0.05):
+    writer = CorpusWriter(seed, mix, links, images, blocks)
+    total = 0
+    for index in range(pages):
+        path = page_path(root, index, depth, fanout)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = writer.page(f"Page {index}")
+        with open(path, "w") as f:
+            f.write(data)
+        total += len(data)
+    return total
+
+
+def generate_static(root, files=20, size=64 * 1024, seed=0):
+    rng = random.Random(seed)
+    total = 0
+    for index in range(files):
+        path = os.path.join(root, "images", f"img{index}.png")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(rng.randbytes(size))
+        total += size
+    return total
+
+
+def add_corpus_args(parser):
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=2, help="directory nesting per page")
+    parser.add_argument("--fanout", type=int, default=8, help="subdirectories per level")
+    parser.add_argument("--blocks", type=int, default=40, help="blocks per page")
+    parser.add_argument("--mix", default="", help="block weights, e.g. paragraph=8,code=2")
+    parser.add_argument("--links", type=float, default=0.3, help="chance of a link per inline run")
+    parser.add_argument("--images", type=float, default=0.05, help="chance of an image per inline run")
+    parser.add_argument("--static-files", type=int, default=20)
+    parser.add_argument("--static-size", type=int, default=64 * 1024)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def write_corpus(args, root):
+    content_bytes = generate_corpus(
+        os.path.join(root, "content"),
+        args.pages,
+        args.depth,
+        args.fanout,
+        args.seed,
+        parse_mix(args.mix),
+        args.blocks,
+        args.links,
+        args.images,
+    )
+    static_bytes = generate_static(
+        os.path.join(root, "static"), args.static_files, args.static_size, args.seed
+    )
+    return content_bytes, static_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic content/ and static/ tree")
+    parser.add_argument("root")
+    add_corpus_args(parser)
+    args = parser.parse_args()
+    content_bytes, static_bytes = write_corpus(args, args.root)
+    print(f"wrote {args.pages} pages ({content_bytes} bytes) and {args.static_files} assets ({static_bytes} bytes) to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import timeit
+
+from bench_corpus import CorpusWriter
+from inline_markdown import (
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_to_textnodes,
+    tokenize_inline,
+)
+from markdown_blocks import BlockType, iter_blocks
+from textnode import TextNode, TextType
+
+
+def chained_split_passes(text):
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+def link_paragraph(links):
+    parts = []
+    for i in range(links):
+        if i % 10 == 0:
+            parts.append(f"see ![figure {i}](/images/fig{i}.png)")
+        parts.append(f"a **bold** word and [link number {i}](https://example.com/page/{i})")
+    return ", ".join(parts)
+
+
+def links_only_paragraph(links):
+    return ", ".join(f"[link number {i}](https://example.com/page/{i})" for i in range(links))
+
+
+def corpus_texts(pages, seed=0):
+    # the inline texts the block converters would hand to text_to_textnodes
+    writer = CorpusWriter(seed)
+    texts = []
+    for index in range(pages):
+        for block_type, lines in iter_blocks(writer.page(f"Page {index}").split("\n")):
+            if block_type == BlockType.PARAGRAPH:
+                texts.append(" ".join(lines))
+            elif block_type == BlockType.HEADING:
+                texts.append(lines[0].lstrip("#")[1:])
+            elif block_type == BlockType.ULIST:
+                texts.extend(line[2:] for line in lines)
+            elif block_type == BlockType.OLIST:
+                texts.extend(line[3:] for line in lines)
+            elif block_type == BlockType.QUOTE:
+                texts.append(" ".join(line.lstrip(">").strip() for line in lines))
+    return texts
+
+
+def best_time(function, number=3):
+    return min(timeit.repeat(function, number=1, repeat=number))
+
+
+def bench_corpus(pages, seed):
+    texts = corpus_texts(pages, seed)
+    prose = [text for text in texts if text_to_textnodes(text) == [TextNode(text, TextType.TEXT)]]
+    print(f"corpus: {pages} pages, {len(texts)} inline texts, {len(prose) / len(texts):.0%} plain text")
+    passes = [
+        ("split passes", chained_split_passes),
+        ("tokenizer", tokenize_inline),
+        ("fast path", text_to_textnodes),
+    ]
+    for label, sample in (("all texts", texts), ("plain texts", prose)):
+        print(f"  {label}:")
+        baseline = None
+        for name, function in passes:
+            seconds = best_time(lambda: [function(text) for text in sample])
+            baseline = baseline or seconds
+            print(f"    {name:<14} {seconds * 1000:>10.2f}ms {baseline / seconds:>7.1f}x")
+
+
+def bench_links(sizes):
+    print(f"{'paragraph':>10} {'links':>6} {'split passes':>14} {'single pass':>14} {'speedup':>8}")
+    for kind, paragraph in (("mixed", link_paragraph), ("links only", links_only_paragraph)):
+        for links in sizes:
+            text = paragraph(links)
+            assert chained_split_passes(text) == text_to_textnodes(text)
+            number = max(1, 2000 // links)
+            old = min(timeit.repeat(lambda: chained_split_passes(text), number=number, repeat=5)) / number
+            new = min(timeit.repeat(lambda: text_to_textnodes(text), number=number, repeat=5)) / number
+            print(f"{kind:>10} {links:>6} {old * 1000:>12.3f}ms {new * 1000:>12.3f}ms {old / new:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inline markdown parsers")
+    parser.add_argument("sizes", nargs="*", type=int, default=[10, 100, 500, 2000],
+                        help="links per paragraph for the link-heavy comparison")
+    parser.add_argument("--pages", type=int, default=500,
+                        help="pages of synthetic corpus for the realistic comparison")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    bench_links(args.sizes)
+    bench_corpus(args.pages, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_corpus import CorpusWriter
+from markdown_blocks import iter_blocks, markdown_to_blocks, open_page
+
+# Peak memory of splitting one big page into blocks, read three ways. Each
+# mode runs in its own interpreter so the peak RSS of one doesn't hide the
+# others'.
+
+MODES = {
+    "read": "f.read() + markdown_to_blocks",
+    "lines": "f.read() + split + iter_blocks",
+    "mmap": "mapped blocks",
+}
+
+
+def write_corpus(path, mb, seed):
+    writer = CorpusWriter(seed, blocks=500)
+    size = 0
+    with open(path, "w") as f:
+        f.write("---\ntitle: Memory benchmark\n---\n\n")
+        index = 0
+        while size < mb * 1024 * 1024:
+            page = writer.page(f"Part {index}") + "\n\n"
+            size += len(page.encode())
+            f.write(page)
+            index += 1
+    return size
+
+
+def split_blocks(path, mode):
+    if mode == "read":
+        with open(path) as f:
+            return len(markdown_to_blocks(f.read()))
+    if mode == "lines":
+        with open(path) as f:
+            return sum(1 for _ in iter_blocks(f.read().split("\n")))
+    with open_page(path) as (front_matter, blocks):
+        return sum(1 for _ in blocks)
+
+
+def run_mode(path, mode, trace):
+    # prints blocks, seconds, peak RSS KiB and traced peak bytes
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    blocks = split_blocks(path, mode)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(blocks, elapsed, rss, peak)
+
+
+def measure(path, mode, trace):
+    command = [sys.executable, __file__, "--run", mode, path] + (["--trace"] if trace else [])
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    blocks, elapsed, rss, peak = output.split()
+    return int(blocks), float(elapsed), int(rss), int(peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of reading a large page into blocks")
+    parser.add_argument("--mb", type=int, default=100, help="size of the generated page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace", action="store_true", help="also report tracemalloc peaks (much slower)")
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_mode(args.run[1], args.run[0], args.trace)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "big.md")
+        size = write_corpus(path, args.mb, args.seed)
+        print(f"{size / 1024 / 1024:.1f} MiB page")
+        print(f"{'mode':>6} {'blocks':>8} {'seconds':>8} {'peak RSS MiB':>13} {'traced MiB':>11}  method")
+        for mode, method in MODES.items():
+            blocks, elapsed, rss, peak = measure(path, mode, args.trace)
+            traced = f"{peak / 1024 / 1024:.1f}" if args.trace else "-"
+            print(f"{mode:>6} {blocks:>8} {elapsed:>8.2f} {rss / 1024:>13.1f} {traced:>11}  {method}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import gc
+import sys
+import time
+import tracemalloc
+
+from bench_corpus import CorpusWriter
+from htmlnode import LeafNode
+from markdown_blocks import markdown_to_html_node
+from textnode import TextNode, TextType
+
+
+# the dict-backed classes the node types used to be, kept for comparison
+class DictTextNode:
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictLeafNode:
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+def measure(make, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    nodes = [make(i) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del nodes
+    return size, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    words = [f"word{i}" for i in range(count)]
+    cases = [
+        ("TextNode", lambda i: DictTextNode(words[i], TextType.TEXT), lambda i: TextNode(words[i], TextType.TEXT)),
+        ("LeafNode", lambda i: DictLeafNode("b", words[i], None, None), lambda i: LeafNode("b", words[i])),
+    ]
+    print(f"{count} nodes each")
+    print(f"{'class':>10} {'dict bytes':>12} {'slots bytes':>12} {'saved':>7} {'dict ms':>9} {'slots ms':>9}")
+    for name, old, new in cases:
+        old_size, old_time = measure(old, count)
+        new_size, new_time = measure(new, count)
+        print(
+            f"{name:>10} {old_size:>12} {new_size:>12} {1 - new_size / old_size:>6.0%}"
+            f" {old_time * 1000:>9.1f} {new_time * 1000:>9.1f}"
+        )
+
+    page = CorpusWriter(seed=1, blocks=2000).page("Allocation benchmark")
+    gc.collect()
+    tracemalloc.start()
+    node = markdown_to_html_node(page)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"parsed a {len(page)} byte page: {size} bytes held by the tree, {peak} bytes peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from markdown_blocks import MarkdownStream, extract_title_from_lines, open_page, page_values, read_document
+from manifest import file_hash
+from links import LinkResolver
+from link_check import LinkChecker, removed_targets
+from template import load_template
+import instrument
+import parse_cache
+import highlight
+from output import OutputWriter, completed
+from frontmatter import parse_front_matter, read_front_matter
+from site_index import SiteIndex, page_url
+from site_files import page_search
+from shards import shard_sources
+from discover import IGNORE_PATTERNS, walk_files
+
+# Building pages: finding them, working out which are stale, rendering them
+# (in worker processes with -j) and writing them out. Converting markdown is
+# left to markdown_blocks, whose source keys the parse cache; this module is
+# not part of that key, so changing how builds run keeps the cached blocks.
+
+# pages larger than this are streamed instead of parsed in memory
+STREAM_THRESHOLD = 8 * 1024 * 1024
+
+
+def scan_page(from_path):
+    # Reads a page only up to its title: the front matter, and the body up
+    # to the first h1 when the front matter doesn't name one.
+    front_matter = read_front_matter(from_path)
+    title = front_matter.get("title")
+    if title is None:
+        with open(from_path, encoding="utf-8") as f:
+            front_matter, rest = parse_front_matter(f)
+            try:
+                title = extract_title_from_lines(rest)
+            except Exception:
+                title = None
+    return title, front_matter
+
+def build_site_index(pages, headers, dest_dir_path, basepath):
+    # Indexes pages from headers, {source: {"title", "front_matter",
+    # "search"}} like manifest.pages, so pages whose header is already known
+    # are indexed without being read.
+    index = SiteIndex()
+    for from_path, dest_path in pages:
+        entry = headers.get(from_path, {})
+        url = page_url(dest_path, dest_dir_path, basepath)
+        index.add(from_path, url, entry.get("title"), entry.get("front_matter", {}))
+        index.pages[from_path]["search"] = entry.get("search")
+    return index
+
+def page_record(links, text, title, front_matter):
+    # what generate_pages reports and the manifest keeps for a rendered page;
+    # text is None when no site file searches or summarizes pages
+    return {
+        "links": links,
+        "search": page_search(text) if text is not None else None,
+        "title": title,
+        "front_matter": front_matter,
+    }
+
+def site_values(values, from_path, basepath, index):
+    # what every template sees besides the page's title, front matter and
+    # content; the page's URL comes from the site index when there is one
+    values["Basepath"] = basepath
+    entry = index.get(from_path) if index is not None else None
+    if entry is not None:
+        values["Url"] = entry["url"]
+    return values
+
+def generate_page(from_path, template_path, dest_path, basepath, log=True, writer=None, assets=None, search=False, index=None):
+    # Returns the page's page_record() and a future for its write. Without a
+    # writer the page is written before generate_page returns. The page's
+    # plain text is only collected for its search entry with search. index
+    # is the SiteIndex, built before any page is rendered.
+    if log:
+        print (f"Generating page from {from_path} to {dest_path} using {template_path}")
+    stats = instrument.stats
+    page_start = time.perf_counter()
+    with stats.timer("template"):
+        template = load_template(template_path, basepath, assets)
+    links = []
+    text = [] if search else None
+    resolver = LinkResolver(basepath, links, assets, text)
+    if writer is None:
+        writer = OutputWriter(0)
+    if os.path.getsize(from_path) > STREAM_THRESHOLD:
+        # Huge generated pages are parsed block by block while being written;
+        # the title goes out before the content, so it needs its own pre-scan.
+        # Their text is not kept: they are too big to summarize or search.
+        resolver.text = None
+        title, front_matter = scan_page(from_path)
+        if title is None:
+            raise Exception ("no header")
+        with open_page(from_path) as (front_matter, blocks), writer.open(dest_path) as d:
+            values = site_values(page_values(title, front_matter, MarkdownStream(None, resolver, blocks)), from_path, basepath, index)
+            out = stats.writer(d)
+            render_start = time.perf_counter()
+            template.write(out, values)
+            render_seconds = time.perf_counter() - render_start
+        future = completed(True)
+        if stats.enabled:
+            # serialization and writing are interleaved; split them by write time
+            stats.add_time("write", out.seconds)
+            stats.add_time("stream_render", render_seconds - out.seconds)
+            stats.page(from_path, time.perf_counter() - page_start, os.path.getsize(dest_path))
+        return page_record(links, text, title, front_matter), future
+    document = read_document(from_path, resolver)
+    if document.title is None:
+        raise Exception ("no header")
+    if text and text[0] == document.title:
+        # the heading the title came from; search weighs the title itself
+        del text[0]
+    values = site_values(document.template_values(), from_path, basepath, index)
+    with stats.timer("serialize"):
+        data = template.render(values).encode()
+    future = writer.submit(dest_path, data)
+    if stats.enabled:
+        stats.page(from_path, time.perf_counter() - page_start, len(data))
+    return page_record(links, text, document.title, document.front_matter), future
+
+def page_dest_path(from_path, dir_path_content, dest_dir_path):
+    # Compute the relative path to preserve folder structure
+    relative_path = os.path.relpath(from_path, dir_path_content)
+    return os.path.normpath(os.path.join(dest_dir_path, os.path.splitext(relative_path)[0] + ".html"))
+
+def template_inputs(template_path, basepath, assets=None):
+    # {path: hash} for the template, every partial it includes and the
+    # fingerprinted assets it references
+    with instrument.stats.timer("template"):
+        template = load_template(template_path, basepath, assets)
+    inputs = {path: file_hash(path) for path in template.dependencies}
+    if assets is not None:
+        inputs.update(assets.deps(template.urls))
+    return inputs
+
+def iter_pages(dir_path_content, dest_dir_path, ignore=IGNORE_PATTERNS):
+    # (source, output, FileEntry) for every page, as the walk finds them and
+    # in sorted order, so logs and errors come out the same on every run
+    for entry in walk_files(dir_path_content, ".md", ignore):
+        from_path = os.path.normpath(entry.path)
+        yield from_path, page_dest_path(from_path, dir_path_content, dest_dir_path), entry
+
+def discover_pages(dir_path_content, dest_dir_path, ignore=IGNORE_PATTERNS):
+    return [(from_path, dest_path) for from_path, dest_path, entry in iter_pages(dir_path_content, dest_dir_path, ignore)]
+
+def source_hash(from_path, stat, previous):
+    # the hash the last build recorded while the file's size and mtime are
+    # the same as then, so unchanged pages aren't read again
+    if previous is not None and previous["deps"] and previous.get("stat") == stat:
+        digest = previous["deps"].get(from_path)
+        if digest is not None:
+            return digest
+    return file_hash(from_path)
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, manifest=None, jobs=1, log=True, atomic=False, assets=None, shard=None, ignore=IGNORE_PATTERNS, search=False):
+    # Returns the SiteIndex of every page, or None for a shard. The index is
+    # built before any page is rendered, so rendering can use it: headers of
+    # pages that are still fresh come from the manifest, and only pages
+    # about to be rebuilt are scanned for theirs. With shard, an (index,
+    # count) pair, only that shard's slice of the pages is built; see
+    # shards.py. Pages matching ignore are never read. search records each
+    # page's search entry, for the site files that need one.
+    shared_inputs = template_inputs(template_path, basepath, assets)
+    # assets a page links to are inputs too, found when it was last rendered
+    asset_hashes = assets.hashes() if assets is not None else {}
+    if manifest is not None:
+        settings = {"basepath": basepath}
+        if assets is not None:
+            settings["assets"] = assets.mode()
+        if highlight.highlighter is not None:
+            settings["highlight"] = True
+        if search:
+            # pages built without it have no search entry to reuse
+            settings["search"] = True
+        manifest.use_inputs(settings)
+    walk = list(instrument.stats.iterate("discover", iter_pages(dir_path_content, dest_dir_path, ignore)))
+    found = [(from_path, dest_path) for from_path, dest_path, entry in walk]
+    if shard is not None:
+        mine = shard_sources({from_path: entry.stat().st_size for from_path, dest_path, entry in walk}, shard)
+        walk = [page for page in walk if page[0] in mine]
+    # source -> [size, mtime] of the pages this build covers
+    seen = {}
+    stale = []
+    for from_path, dest_path, entry in walk:
+        if manifest is None:
+            stale.append((from_path, dest_path, None, None))
+            continue
+        stat = entry.stat()
+        seen[from_path] = [stat.st_size, stat.st_mtime_ns]
+        previous = manifest.pages.get(from_path)
+        deps = {from_path: source_hash(from_path, seen[from_path], previous)}
+        deps.update(shared_inputs)
+        # follow the graph: only pages with a changed input are rebuilt
+        reason = manifest.stale_reason(from_path, dest_path, deps, asset_hashes)
+        if reason is None:
+            continue
+        if previous is not None and previous["output"] != dest_path:
+            manifest.remove_output(previous["output"], dest_dir_path)
+        stale.append((from_path, dest_path, deps, reason))
+
+    with instrument.stats.timer("index"):
+        headers = dict(manifest.pages) if manifest is not None else {}
+        for from_path, dest_path, deps, reason in stale:
+            title, front_matter = scan_page(from_path)
+            headers[from_path] = {"title": title, "front_matter": front_matter}
+        # a shard indexes the pages it builds; the merge indexes the site
+        index = build_site_index([(from_path, dest_path) for from_path, dest_path, entry in walk], headers, dest_dir_path, basepath)
+
+    rendered = generate_pages(stale, template_path, basepath, manifest, jobs, log, atomic, assets, search, index)
+    for source, page in rendered.items():
+        index.pages[source]["search"] = page["search"]
+    removed = ()
+    if manifest is not None:
+        sources = {from_path for from_path, dest_path in found}
+        for source in sorted(set(manifest.pages) - set(seen)):
+            entry = manifest.forget(source)
+            if source in sources:
+                # moved to another shard, which owns its output now
+                continue
+            # outputs whose sources disappeared since the last build
+            if log:
+                print(f"Removing {entry['output']} (source {source} is gone)")
+            manifest.remove_output(entry["output"], dest_dir_path)
+        for source, stat in seen.items():
+            manifest.pages[source]["stat"] = stat
+        # pages that weren't rebuilt still link where they did last time
+        rendered = manifest.pages
+        removed, manifest.removed = manifest.removed, set()
+    if shard is not None:
+        # The link check needs the whole site: a shard's links may point at
+        # pages other shards build. Merging the shards does it.
+        return None
+    report_broken_links(found, rendered, dest_dir_path, assets, removed)
+    return index
+
+def report_broken_links(found, pages, dest_dir_path, assets=None, removed=()):
+    # pages is {source: entry} like manifest.pages, and each entry keeps the
+    # URLs found broken under "broken". Pages rendered since the last check
+    # (they have no "broken" yet) and pages linking to a removed output have
+    # every link checked; the rest only check again the links that were
+    # broken, which an output being added may have fixed.
+    broken = []
+    with instrument.stats.timer("link_check"):
+        checker = LinkChecker(dest_dir_path, assets)
+        targets = removed_targets(removed)
+        for from_path, dest_path in found:
+            entry = pages.get(from_path)
+            if entry is None:
+                continue
+            if "broken" not in entry or (targets and checker.links_into(dest_path, entry["links"], targets)):
+                entry["broken"] = checker.broken(dest_path, entry["links"])
+            elif entry["broken"]:
+                entry["broken"] = checker.broken(dest_path, entry["broken"])
+            broken.extend((from_path, url) for url in entry["broken"])
+    for source, url in broken:
+        print(f"Broken link in {source}: {url}")
+    return broken
+
+def generate_pages(pages, template_path, basepath, manifest=None, jobs=1, log=True, atomic=False, assets=None, search=False, index=None):
+    # Returns {source: page_record()} for the pages generated: the URLs each
+    # links to, its search entry, title and front matter.
+    if jobs is None or jobs < 1:
+        jobs = os.cpu_count() or 1
+    if jobs > 1:
+        # pages may come from a lazy walk; the pool needs them all up front
+        pages = list(pages)
+        jobs = min(jobs, len(pages))
+    if jobs <= 1:
+        return write_pages(pages, template_path, basepath, manifest, log, atomic, assets, search, index)
+    profile = instrument.stats.enabled
+    cache_settings = parse_cache.settings()
+    highlight_settings = highlight.settings()
+    rendered = {}
+    # each worker gets the index once, not with every page
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=_set_site_index, initargs=(index,))
+    try:
+        futures = [
+            executor.submit(
+                _generate_page_job, from_path, template_path, dest_path, basepath, profile, cache_settings,
+                highlight_settings, atomic, assets, search
+            )
+            for from_path, dest_path, deps, reason in pages
+        ]
+        # report in submission order, whatever order the workers finish in
+        for (from_path, dest_path, deps, reason), future in zip(pages, futures):
+            if log:
+                print (f"Generating page from {from_path} to {dest_path} using {template_path}")
+            try:
+                result = future.result()
+            except Exception as e:
+                raise Exception(f"failed to generate {from_path}: {e}") from e
+            if result["stats"] is not None:
+                instrument.stats.merge(result["stats"])
+            if result["cache"] is not None and parse_cache.cache is not None:
+                parse_cache.cache.hits += result["cache"][0]
+                parse_cache.cache.misses += result["cache"][1]
+            if result["highlight"] is not None and highlight.highlighter is not None:
+                highlight.highlighter.cache.hits += result["highlight"][0]
+                highlight.highlighter.cache.misses += result["highlight"][1]
+            page = result["page"]
+            rendered[from_path] = page
+            if manifest is not None:
+                manifest.record(from_path, dest_path, page_deps(deps, page["links"], assets), reason=reason, **page)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return rendered
+
+def page_deps(deps, links, assets):
+    if assets is not None:
+        deps.update(assets.deps(links))
+    return deps
+
+def write_pages(pages, template_path, basepath, manifest=None, log=True, atomic=False, assets=None, search=False, index=None):
+    # Renders on this thread while the writer's threads write finished pages.
+    # A page only goes into the manifest once its write has succeeded.
+    writer = OutputWriter(atomic=atomic)
+    rendered = []
+    try:
+        for from_path, dest_path, deps, reason in pages:
+            page, future = generate_page(from_path, template_path, dest_path, basepath, log, writer, assets, search, index)
+            rendered.append((from_path, dest_path, deps, reason, page, future))
+    finally:
+        writer.close()
+        highlight.flush()
+        if manifest is not None:
+            for from_path, dest_path, deps, reason, page, future in rendered:
+                if future.exception() is None:
+                    manifest.record(from_path, dest_path, page_deps(deps, page["links"], assets), reason=reason, **page)
+    for from_path, dest_path, deps, reason, page, future in rendered:
+        if future.exception() is not None:
+            raise Exception(f"failed to write {dest_path}: {future.exception()}") from future.exception()
+    return {from_path: page for from_path, dest_path, deps, reason, page, future in rendered}
+
+# the SiteIndex in a worker process, set when the pool starts it
+_site_index = None
+
+def _set_site_index(index):
+    global _site_index
+    _site_index = index
+
+def _generate_page_job(from_path, template_path, dest_path, basepath, profile, cache_settings, highlight_settings, atomic, assets, search):
+    # runs in a worker process, which also does the highlighting; its stats
+    # travel back to the parent
+    if cache_settings is None:
+        parse_cache.disable()
+        cache_counts = None
+    else:
+        cache = parse_cache.configure(*cache_settings)
+        cache_counts = (cache.hits, cache.misses)
+    if highlight_settings is None:
+        highlight.disable()
+        highlight_counts = None
+    else:
+        highlighted = highlight.configure(*highlight_settings).cache
+        highlight_counts = (highlighted.hits, highlighted.misses)
+    if profile:
+        stats = instrument.enable()
+    else:
+        instrument.disable()
+    try:
+        # the pool already overlaps pages, so each worker writes inline
+        writer = OutputWriter(0, atomic)
+        page, future = generate_page(from_path, template_path, dest_path, basepath, False, writer, assets, search, _site_index)
+        future.result()
+    finally:
+        instrument.disable()
+        highlight.flush()
+    if cache_counts is not None:
+        cache_counts = (cache.hits - cache_counts[0], cache.misses - cache_counts[1])
+    if highlight_counts is not None:
+        highlight_counts = (highlighted.hits - highlight_counts[0], highlighted.misses - highlight_counts[1])
+    return {
+        "stats": stats.snapshot() if profile else None,
+        "cache": cache_counts,
+        "highlight": highlight_counts,
+        "page": page,
+    }
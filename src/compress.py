@@ -0,0 +1,136 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from discover import walk_files
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Optional post-processing stage: text outputs get .gz (and, with the brotli
+# module, .br) siblings that a static server can send as they are instead of
+# compressing every response. A sibling carries its source's mtime, so a
+# source that was not rewritten since is not compressed again.
+
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".json", ".xml", ".svg", ".txt", ".map", ".ico"}
+# below this, headers and framing eat most of the saving
+MIN_SIZE = 256
+COMPRESS_THREADS = 4
+
+
+def encodings():
+    # (suffix, compress function) for every encoding available here
+    found = [(".gz", lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        found.append((".br", lambda data: brotli.compress(data, quality=11)))
+    return found
+
+
+def is_compressible(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def precompress_tree(root, manifest=None, threads=COMPRESS_THREADS):
+    # Compresses every text output under root that changed since its siblings
+    # were written. With a manifest, siblings of outputs that are gone (or no
+    # longer worth compressing) are removed too; without one, files ending in
+    # .gz or .br are never touched, since they may be real downloads.
+    counts = {"compressed": 0, "skipped": 0, "removed": 0, "bytes": 0}
+    for suffix, _ in encodings():
+        counts[suffix] = 0
+    sources = [
+        entry.path for entry in walk_files(root, ignore=None)
+        if is_compressible(entry.path) and entry.stat().st_size >= MIN_SIZE
+    ]
+    previous = manifest.compressed if manifest is not None else {}
+    written = {}
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for path, result in zip(sources, executor.map(compress_file, sources)):
+            rel_path = os.path.relpath(path, root)
+            suffixes, sizes, changed = result
+            written[rel_path] = suffixes
+            for suffix in previous.get(rel_path, []):
+                if suffix not in suffixes and os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+                    counts["removed"] += 1
+            if changed:
+                counts["compressed"] += 1
+            else:
+                counts["skipped"] += 1
+            counts["bytes"] += sizes.pop("", 0)
+            for suffix, size in sizes.items():
+                counts[suffix] += size
+    counts["removed"] += remove_siblings(root, {rel: suffixes for rel, suffixes in previous.items() if rel not in written})
+    if manifest is not None:
+        manifest.compressed = written
+    return counts
+
+
+def remove_precompressed(root, manifest):
+    # for builds that stopped precompressing: stale siblings would be served
+    # in place of the pages they were made from
+    removed = remove_siblings(root, manifest.compressed)
+    manifest.compressed = {}
+    return removed
+
+
+def remove_siblings(root, compressed):
+    removed = 0
+    for rel_path, suffixes in compressed.items():
+        for suffix in suffixes:
+            path = os.path.join(root, rel_path) + suffix
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def compress_file(path):
+    # Returns (suffixes written, {suffix: size} with "" for the source,
+    # whether anything was compressed this time).
+    stat = os.stat(path)
+    suffixes = []
+    sizes = {"": stat.st_size}
+    data = None
+    changed = False
+    for suffix, compress in encodings():
+        target = path + suffix
+        try:
+            target_stat = os.stat(target)
+        except FileNotFoundError:
+            target_stat = None
+        if target_stat is not None and target_stat.st_mtime_ns == stat.st_mtime_ns:
+            suffixes.append(suffix)
+            sizes[suffix] = target_stat.st_size
+            continue
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        compressed = compress(data)
+        changed = True
+        if len(compressed) >= len(data):
+            # not worth serving; make sure an old sibling doesn't linger
+            if target_stat is not None:
+                os.remove(target)
+            sizes[suffix] = len(data)
+            continue
+        tmp_path = f"{target}.tmp{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, target)
+        suffixes.append(suffix)
+        sizes[suffix] = len(compressed)
+    return suffixes, sizes, changed
+
+
+def ratio_summary(counts):
+    # "gzip 24.1%, brotli 20.3%" of the bytes that were eligible
+    names = {".gz": "gzip", ".br": "brotli"}
+    if not counts["bytes"]:
+        return "nothing to compress"
+    return ", ".join(
+        f"{names[suffix]} {counts[suffix] / counts['bytes'] * 100:.1f}%" for suffix, _ in encodings()
+    ) + f" of {counts['bytes']} bytes"
@@ -0,0 +1,71 @@
+import fnmatch
+import os
+
+# Every build step that looks for files (pages, static assets, outputs to
+# compress, the watcher) goes through walk_files: a lazy os.scandir walk in
+# sorted order, so builds are reproducible whatever order the filesystem
+# lists entries in, and the stat that came with each DirEntry is reused
+# instead of asking the filesystem again.
+
+# editor swap and backup files, and the like, never belong in a build
+IGNORE_PATTERNS = ("*.swp", "*.swo", "*.swx", "*~", ".#*", "#*#", ".DS_Store")
+
+
+class FileEntry:
+    __slots__ = ("path", "rel_path", "_entry", "_stat")
+
+    def __init__(self, path, rel_path, entry=None):
+        self.path = path
+        self.rel_path = rel_path
+        self._entry = entry
+        self._stat = None
+
+    def stat(self):
+        # DirEntry caches its stat, and so does a FileEntry made without one
+        if self._stat is None:
+            self._stat = self._entry.stat() if self._entry is not None else os.stat(self.path)
+        return self._stat
+
+    def __repr__(self):
+        return f"FileEntry({self.path})"
+
+
+def is_ignored(rel_path, patterns):
+    # Patterns with a slash match the whole path below the walk's root, the
+    # rest match the last name in it; the walk has already skipped the
+    # contents of ignored directories.
+    rel_path = rel_path.replace(os.sep, "/")
+    name = rel_path.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(rel_path if "/" in pattern else name, pattern.strip("/")):
+            return True
+    return False
+
+
+def walk_files(root, suffix=None, ignore=IGNORE_PATTERNS):
+    # Yields a FileEntry for every file under root ending in suffix, like
+    # os.walk would: a directory's files in name order, then its
+    # subdirectories in name order. Ignored directories are not entered.
+    # Each directory is listed only when the walk reaches it.
+    stack = [(root, "")]
+    while stack:
+        path, rel_dir = stack.pop()
+        try:
+            with os.scandir(path) as listing:
+                entries = sorted(listing, key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        subdirs = []
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            if ignore and is_ignored(rel_path, ignore):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append((entry.path, rel_path))
+                continue
+            if entry.is_symlink() and entry.is_dir():
+                # symlinked directories are not followed, as in os.walk
+                continue
+            if suffix is None or entry.name.endswith(suffix):
+                yield FileEntry(entry.path, rel_path, entry)
+        stack.extend(reversed(subdirs))
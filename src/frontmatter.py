@@ -0,0 +1,69 @@
+import itertools
+
+# Front matter is an optional block of "key: value" lines at the very top of
+# a page, fenced by "---" lines:
+#
+#   ---
+#   title: Tom Bombadil
+#   date: 2024-05-01
+#   tags: [tolkien, characters]
+#   ---
+#
+# Values are strings, or lists when written in [brackets].
+
+FENCE = "---"
+
+
+def parse_front_matter(lines):
+    # Reads the front matter from an iterable of lines and stops right after
+    # the closing fence. Returns (metadata, rest) where rest iterates over the
+    # remaining lines, so a caller streaming a file keeps reading the body
+    # from where the scan stopped.
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return {}, iter(())
+    if first.rstrip() != FENCE:
+        return {}, itertools.chain([first], lines)
+    consumed = [first]
+    metadata = {}
+    for line in lines:
+        consumed.append(line)
+        line = line.strip()
+        if line == FENCE:
+            return metadata, lines
+        if line == "" or line.startswith("#"):
+            continue
+        key, sep, value = line.partition(":")
+        if not sep or not key.strip():
+            break
+        metadata[key.strip()] = parse_value(value.strip())
+    # not front matter after all, the page just starts with a horizontal rule
+    return {}, itertools.chain(consumed, lines)
+
+
+def parse_value(value):
+    if value.startswith("[") and value.endswith("]"):
+        return [unquote(item.strip()) for item in value[1:-1].split(",") if item.strip()]
+    return unquote(value)
+
+
+def unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def split_front_matter(markdown):
+    # (metadata, body) for a page already read into memory
+    if not markdown.startswith(FENCE):
+        return {}, markdown
+    metadata, rest = parse_front_matter(markdown.split("\n"))
+    return metadata, "\n".join(rest)
+
+
+def read_front_matter(path):
+    # header-only scan: the body is never read past the closing fence
+    with open(path, encoding="utf-8") as f:
+        metadata, rest = parse_front_matter(f)
+    return metadata
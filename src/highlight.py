@@ -0,0 +1,137 @@
+import hashlib
+import os
+import re
+import sys
+
+from parse_cache import DEFAULT_MAX_BYTES, ParseCache, block_key
+import instrument
+
+try:
+    import pygments
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:
+    pygments = None
+
+# Optional build-time highlighting of fenced code blocks, when Pygments is
+# installed. Highlighting is the slowest thing a page can ask for, and the
+# same snippets come back page after page and version after version, so the
+# HTML for each (language, code) pair is kept in its own persistent cache.
+# Highlighted code is marked up with classes; the colours come from a
+# stylesheet, which "python3 src/highlight.py [STYLE]" prints.
+
+# the info string's first word, when it looks like a language name
+LANGUAGE = re.compile(r"[\w.+#-]+")
+
+DEFAULT_STYLE = "default"
+
+
+def code_language(info):
+    # "python title=x.py" -> "python"
+    words = info.split()
+    if words and LANGUAGE.fullmatch(words[0]):
+        return words[0].lower()
+    return None
+
+
+def highlighter_version():
+    # cached HTML is only good for the same Pygments and the same code here
+    digest = hashlib.sha256()
+    digest.update(pygments.__version__.encode() if pygments is not None else b"none")
+    with open(os.path.abspath(__file__), "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+_lexers = {}
+
+
+def lexer_for(language):
+    # the Pygments lexer for a language name, or None
+    if pygments is None or language is None:
+        return None
+    if language not in _lexers:
+        try:
+            _lexers[language] = get_lexer_by_name(language)
+        except ClassNotFound:
+            _lexers[language] = None
+    return _lexers[language]
+
+
+class Highlighter:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = highlighter_version()
+        self.cache = ParseCache(path, self.version, max_bytes, name="highlight_cache")
+        self.formatter = HtmlFormatter(nowrap=True) if pygments is not None else None
+
+    def highlight(self, language, code):
+        # highlighted HTML for code, or None when the language isn't known
+        lexer = lexer_for(language)
+        if lexer is None:
+            return None
+        key = block_key(code, language)
+        cached = self.cache.get_many([key]).get(key)
+        if cached is not None:
+            return cached[0]
+        with instrument.stats.timer("highlight"):
+            html = pygments.highlight(code, lexer, self.formatter)
+        self.cache.put(key, html)
+        return html
+
+    def flush(self):
+        self.cache.flush()
+
+    def close(self):
+        self.cache.close()
+
+    def __repr__(self):
+        return f"Highlighter({self.path}, {self.cache.hits} hits, {self.cache.misses} misses)"
+
+
+highlighter = None
+
+
+def configure(path, max_bytes=DEFAULT_MAX_BYTES):
+    global highlighter
+    if highlighter is not None and highlighter.path == path and highlighter.max_bytes == max_bytes:
+        return highlighter
+    if highlighter is not None:
+        highlighter.close()
+    highlighter = Highlighter(path, max_bytes)
+    return highlighter
+
+
+def settings():
+    if highlighter is None:
+        return None
+    return (highlighter.path, highlighter.max_bytes)
+
+
+def disable():
+    global highlighter
+    if highlighter is not None:
+        highlighter.close()
+    highlighter = None
+
+
+def flush():
+    if highlighter is not None:
+        highlighter.flush()
+
+
+def cache_key():
+    # part of every parse cache key, since cached blocks hold highlighted code
+    return "" if highlighter is None else f":highlight={highlighter.version}"
+
+
+def style_css(style=DEFAULT_STYLE):
+    return HtmlFormatter(style=style).get_style_defs(".highlight")
+
+
+if __name__ == "__main__":
+    if pygments is None:
+        sys.exit("highlighting needs Pygments")
+    print(style_css(*sys.argv[1:2]))
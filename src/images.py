@@ -0,0 +1,195 @@
+import json
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Optional image stage: images are recompressed losslessly and, when Pillow is
+# installed, resized into narrower variants for srcset. Results are cached by
+# the hash of the source image, so an unchanged image is never processed twice.
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif"}
+VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_THREADS = 4
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# ancillary chunks that stay valid when the image data is recompressed;
+# anything else (text, timestamps, private chunks) is dropped
+PNG_KEEP = {b"PLTE", b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"sBIT", b"pHYs", b"bKGD", b"eXIf"}
+
+
+def is_image(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def image_size(data):
+    # (width, height) read from the file header, or None if unrecognized
+    if data.startswith(PNG_SIGNATURE) and data[12:16] == b"IHDR":
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", data[6:10])
+    if data.startswith(b"\xff\xd8"):
+        return jpeg_size(data)
+    return None
+
+
+def jpeg_size(data):
+    pos = 2
+    while pos + 9 < len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        length = struct.unpack(">H", data[pos + 2 : pos + 4])[0]
+        # SOF0..SOF15, except DHT, JPG and DAC which share the range
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[pos + 5 : pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def png_chunks(data):
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos : pos + 8])
+        yield kind, data[pos + 8 : pos + 8 + length]
+        pos += 12 + length
+
+
+def png_chunk(kind, body):
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+def recompress_png(data):
+    # Lossless: the pixel data is only deflated again at the highest level.
+    # Returns the smaller file, or None when there is nothing to gain.
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    chunks = list(png_chunks(data))
+    if any(kind == b"acTL" for kind, body in chunks):
+        # animated PNG frames live outside IDAT
+        return None
+    idat = b"".join(body for kind, body in chunks if kind == b"IDAT")
+    try:
+        pixels = zlib.decompress(idat)
+    except zlib.error:
+        return None
+    out = [PNG_SIGNATURE]
+    for kind, body in chunks:
+        if kind == b"IDAT":
+            if idat is not None:
+                out.append(png_chunk(b"IDAT", zlib.compress(pixels, 9)))
+                idat = None
+        elif kind[0:1].isupper() or kind in PNG_KEEP:
+            out.append(png_chunk(kind, body))
+    optimized = b"".join(out)
+    return optimized if len(optimized) < len(data) else None
+
+
+class ImageCache:
+    def __init__(self, root, widths=VARIANT_WIDTHS):
+        self.root = root
+        self.widths = widths
+        self.index_path = os.path.join(root, "index.json")
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        self.processed = 0
+
+    def process_all(self, images):
+        # images is [(source path, digest)]; returns {digest: record}. Only
+        # images missing from the cache are processed, several at a time
+        # (zlib and Pillow release the GIL).
+        records = {}
+        missing = {}
+        for path, digest in images:
+            record = self.index.get(digest)
+            if record is not None and self.blobs_exist(record):
+                records[digest] = record
+            else:
+                missing.setdefault(digest, path)
+        if missing:
+            with ThreadPoolExecutor(max_workers=IMAGE_THREADS) as executor:
+                digests = list(missing)
+                results = executor.map(self.process, digests, [missing[digest] for digest in digests])
+                for digest, record in zip(digests, results):
+                    self.index[digest] = record
+                    records[digest] = record
+                    self.processed += 1
+            self.save()
+        return records
+
+    def blobs_exist(self, record):
+        names = [variant[2] for variant in record["variants"]]
+        if record["optimized"]:
+            names.append(record["optimized"])
+        return all(os.path.exists(self.blob_path(name)) for name in names)
+
+    def blob_path(self, name):
+        return os.path.join(self.root, name)
+
+    def process(self, digest, path):
+        # record: {"width", "height", "optimized": blob or None,
+        #          "variants": [[width, height, blob], ...]}
+        with open(path, "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(path)[1].lower()
+        size = image_size(data)
+        record = {"width": None, "height": None, "optimized": None, "variants": []}
+        if size is None:
+            return record
+        record["width"], record["height"] = size
+        os.makedirs(self.root, exist_ok=True)
+        optimized = recompress_png(data) if ext == ".png" else None
+        if optimized is not None:
+            record["optimized"] = self.store(f"{digest}{ext}", optimized)
+        if Image is not None:
+            record["variants"] = self.resize(digest, path, ext, size)
+        return record
+
+    def resize(self, digest, path, ext, size):
+        width, height = size
+        variants = []
+        with Image.open(path) as image:
+            for variant_width in self.widths:
+                if variant_width >= width:
+                    break
+                variant_height = max(1, round(height * variant_width / width))
+                resized = image.resize((variant_width, variant_height), Image.LANCZOS)
+                name = f"{digest}-{variant_width}{ext}"
+                resized.save(self.blob_path(name), format=image.format, optimize=True)
+                variants.append([variant_width, variant_height, name])
+        return variants
+
+    def store(self, name, data):
+        tmp_path = f"{self.blob_path(name)}.tmp{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.blob_path(name))
+        return name
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def __repr__(self):
+        return f"ImageCache({self.root}, {len(self.index)} images)"
+
+
+def variant_path(rel_path, width):
+    # images/tom.png -> images/tom.480w.png
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{width}w{ext}"
@@ -3,22 +3,101 @@ import re
 from textnode import TextNode, TextType
 
 
+DELIMITERS = {"**": TextType.BOLD, "_": TextType.ITALIC, "`": TextType.CODE}
+
+# Delimiters bind in the order bold, italic, code (the order the old split
+# passes ran in), so a region may not contain a delimiter that binds tighter.
+_TIGHTER_DELIMITERS = {"**": (), "_": ("**",), "`": ("**", "_")}
+
+_MARKDOWN_IMAGE_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_MARKDOWN_LINK_RE = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
+
 def text_to_textnodes(text):
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    # Most text is plain prose: without a delimiter or a "[" there is nothing
+    # to tokenize. Substring checks run at memchr speed, well ahead of a regex
+    # search that has to try every alternative at every position.
+    if "*" not in text and "_" not in text and "`" not in text and "[" not in text:
+        return [TextNode(text, TextType.TEXT)] if text else []
+    return tokenize_inline(text)
+
+
+def tokenize_inline(text):
+    # One scan that jumps from delimiter to delimiter with str.find. The
+    # plain text between them is then split around images and links, which
+    # never contain a delimiter: the order the split passes ran in, without
+    # their copy of the rest of the text for every match.
+    nodes = []
+    pos = 0
+    size = len(text)
+    find = text.find
+    # where each delimiter next occurs at or after pos, or size for nowhere
+    bold = italic = code = -1
+    while True:
+        if bold < pos:
+            bold = find("**", pos)
+            if bold == -1:
+                bold = size
+        if italic < pos:
+            italic = find("_", pos)
+            if italic == -1:
+                italic = size
+        if code < pos:
+            code = find("`", pos)
+            if code == -1:
+                code = size
+        at = min(bold, italic, code)
+        if at == size:
+            break
+        delimiter = "**" if at == bold else "_" if at == italic else "`"
+        if at > pos:
+            _split_images_and_links(text[pos:at], nodes)
+        start = at + len(delimiter)
+        end = find(delimiter, start)
+        if end == -1:
+            raise ValueError("invalid markdown, formatted section not closed")
+        for tighter in _TIGHTER_DELIMITERS[delimiter]:
+            if find(tighter, start, end) != -1:
+                raise ValueError("invalid markdown, formatted section not closed")
+        if end > start:
+            nodes.append(TextNode(text[start:end], DELIMITERS[delimiter]))
+        pos = end + len(delimiter)
+    if pos < size:
+        _split_images_and_links(text[pos:] if pos else text, nodes)
     return nodes
 
 
+def _split_images_and_links(text, nodes):
+    # Images first, then links in the text around them. re.split with two
+    # groups gives [text, alt, url, text, ..., text] in one call.
+    if "[" not in text:
+        nodes.append(TextNode(text, TextType.TEXT))
+        return
+    parts = _MARKDOWN_IMAGE_RE.split(text) if "![" in text else [text]
+    for i in range(0, len(parts), 3):
+        if "[" in parts[i]:
+            links = _MARKDOWN_LINK_RE.split(parts[i])
+            for j in range(0, len(links) - 1, 3):
+                if links[j]:
+                    nodes.append(TextNode(links[j], TextType.TEXT))
+                nodes.append(TextNode(links[j + 1], TextType.LINK, links[j + 2]))
+            if links[-1]:
+                nodes.append(TextNode(links[-1], TextType.TEXT))
+        elif parts[i]:
+            nodes.append(TextNode(parts[i], TextType.TEXT))
+        if i + 1 < len(parts):
+            nodes.append(TextNode(parts[i + 1], TextType.IMAGE, parts[i + 2]))
+
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
     for old_node in old_nodes:
         if old_node.text_type != TextType.TEXT:
             new_nodes.append(old_node)
             continue
+        if old_node.text and delimiter not in old_node.text:
+            new_nodes.append(old_node)
+            continue
         split_nodes = []
         sections = old_node.text.split(delimiter)
         if len(sections) % 2 == 0:
@@ -89,12 +168,8 @@ def split_nodes_link(old_nodes):
 
 
 def extract_markdown_images(text):
-    pattern = r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(pattern, text)
-    return matches
+    return _MARKDOWN_IMAGE_RE.findall(text)
 
 
 def extract_markdown_links(text):
-    pattern = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(pattern, text)
-    return matches
+    return _MARKDOWN_LINK_RE.findall(text)
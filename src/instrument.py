@@ -0,0 +1,141 @@
+import contextlib
+import json
+import time
+
+# Build code reports through instrument.stats, which is a no-op until
+# enable() swaps in a BuildStats for the current process.
+
+
+class NullStats:
+    enabled = False
+
+    def timer(self, name):
+        return _NULL_TIMER
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def iterate(self, name, iterable):
+        return iterable
+
+    def writer(self, fp):
+        return fp
+
+    def page(self, source, seconds, bytes_written):
+        pass
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class BuildStats:
+    # Timers are inclusive: block_split includes the block_type time of the
+    # blocks it produced, and parallel builds sum worker time, not wall time.
+    enabled = True
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+        self.pages = []
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def iterate(self, name, iterable):
+        # charges the time spent producing each item, not consuming it
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    def writer(self, fp):
+        return TimedWriter(fp)
+
+    def page(self, source, seconds, bytes_written):
+        self.pages.append({"source": source, "seconds": seconds, "bytes": bytes_written})
+        self.count("pages")
+        self.count("bytes_written", bytes_written)
+
+    def snapshot(self):
+        return {"timers": dict(self.timers), "counters": dict(self.counters), "pages": list(self.pages)}
+
+    def merge(self, snapshot):
+        for name, seconds in snapshot["timers"].items():
+            self.add_time(name, seconds)
+        for name, n in snapshot["counters"].items():
+            self.count(name, n)
+        self.pages.extend(snapshot["pages"])
+
+    def summary(self, slowest=10):
+        pages = sorted(self.pages, key=lambda page: (-page["seconds"], page["source"]))
+        return {
+            "timers": {name: self.timers[name] for name in sorted(self.timers)},
+            "counters": {name: self.counters[name] for name in sorted(self.counters)},
+            "slowest_pages": pages[:slowest],
+        }
+
+    def write_json(self, path, slowest=10):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(slowest), f, indent=2)
+            f.write("\n")
+
+    def __repr__(self):
+        return f"BuildStats({len(self.pages)} pages, timers: {self.timers})"
+
+
+class TimedWriter:
+    def __init__(self, fp):
+        self.fp = fp
+        self.seconds = 0.0
+
+    def write(self, data):
+        start = time.perf_counter()
+        n = self.fp.write(data)
+        self.seconds += time.perf_counter() - start
+        return n
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        children = getattr(node, "children", None)
+        if children:
+            stack.extend(children)
+    return count
+
+
+stats = NullStats()
+
+
+def enable():
+    global stats
+    stats = BuildStats()
+    return stats
+
+
+def disable():
+    global stats
+    stats = NullStats()
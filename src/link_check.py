@@ -0,0 +1,81 @@
+import os
+from urllib.parse import unquote, urlsplit
+
+# Checking a built site's internal links against the files in it; links are
+# rewritten while rendering by links.LinkResolver.
+
+
+def link_target(url, output_path, dest_dir, assets=None):
+    # The file in dest_dir an internal link points at, or None for links
+    # that leave the site (other hosts, mailto:, in-page anchors).
+    if assets is not None and url.startswith("/"):
+        url = assets.url(url)
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if path.startswith("/"):
+        return os.path.normpath(os.path.join(dest_dir, path.lstrip("/")))
+    return os.path.normpath(os.path.join(os.path.dirname(output_path), path))
+
+
+def target_exists(target):
+    # the same lookups a static host does for a pretty URL
+    return (
+        os.path.isfile(target)
+        or os.path.isfile(os.path.join(target, "index.html"))
+        or os.path.isfile(target + ".html")
+    )
+
+
+def removed_targets(removed):
+    # the link targets that outputs going away can break: each output, and
+    # the pretty URLs it was served under
+    targets = set()
+    for path in removed:
+        path = os.path.normpath(path)
+        targets.add(path)
+        if os.path.basename(path) == "index.html":
+            targets.add(os.path.dirname(path))
+        if path.endswith(".html"):
+            targets.add(path[: -len(".html")])
+    return targets
+
+
+class LinkChecker:
+    # Resolves links and looks their targets up once per check: pages share
+    # most of the URLs they link to.
+    def __init__(self, dest_dir, assets=None):
+        self.dest_dir = dest_dir
+        self.assets = assets
+        self.targets = {}
+        self.exists = {}
+
+    def target(self, url, output_path):
+        # only relative links depend on where the page is
+        key = url if url.startswith("/") else (url, os.path.dirname(output_path))
+        if key not in self.targets:
+            self.targets[key] = link_target(url, output_path, self.dest_dir, self.assets)
+        return self.targets[key]
+
+    def broken(self, output_path, links):
+        # the URLs among links whose target is missing, each once
+        broken = []
+        for url in dict.fromkeys(links):
+            target = self.target(url, output_path)
+            if target is None:
+                continue
+            if target not in self.exists:
+                self.exists[target] = target_exists(target)
+            if not self.exists[target]:
+                broken.append(url)
+        return broken
+
+    def links_into(self, output_path, links, targets):
+        return any(self.target(url, output_path) in targets for url in links)
+
+
+def broken_links(pages, dest_dir, assets=None):
+    # pages is (source, output_path, links); returns [(source, url)]
+    checker = LinkChecker(dest_dir, assets)
+    return [(source, url) for source, output_path, links in pages for url in checker.broken(output_path, links)]
@@ -0,0 +1,45 @@
+from textnode import TextType
+
+
+class LinkResolver:
+    def __init__(self, basepath="/", links=None, assets=None, text=None):
+        self.basepath = basepath
+        # when given a list, every URL the page uses is recorded in it
+        self.links = links
+        # an AssetMap, when static assets are fingerprinted
+        self.assets = assets
+        # when given a list, the plain text of every paragraph, heading,
+        # list item and quote is recorded in it, for feeds and search
+        self.text = text
+
+    def url(self, url):
+        if self.links is not None:
+            self.links.append(url)
+        # site-absolute links are served from under the basepath
+        if url.startswith("/"):
+            if self.assets is not None:
+                url = self.assets.url(url)
+            return self.basepath + url[1:]
+        return url
+
+    def image_props(self, url):
+        # width, height and srcset for images the image stage measured
+        if self.assets is None or not url.startswith("/"):
+            return {}
+        return self.assets.image_props(url, self.basepath)
+
+    def add_text(self, text_nodes):
+        if self.text is None:
+            return
+        text = " ".join("".join(node.text for node in text_nodes if node.text_type != TextType.IMAGE).split())
+        # collapsed, so a fragment never spans lines when a cached block stores it
+        if text:
+            self.text.append(text)
+
+    def cache_key(self):
+        if self.assets is not None:
+            return f"{self.basepath}:{self.assets.key}"
+        return self.basepath
+
+    def __repr__(self):
+        return f"LinkResolver({self.basepath})"
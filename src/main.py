@@ -1,31 +1,249 @@
 import sys
 import os
+import time
 import shutil
+import argparse
 from textnode import *
 from markdown_blocks import *
+from build import *
+from manifest import Manifest
+from assets import AssetMap, sync_tree
+from images import ImageCache
+from compress import precompress_tree, ratio_summary, remove_precompressed
+from site_files import write_site_files
+from shards import merge_manifests, parse_shard, shard_manifest_path
+from watch import Watcher
+from discover import IGNORE_PATTERNS, walk_files
+import instrument
+import parse_cache
+import highlight
+
+MANIFEST_PATH = './.build-manifest.json'
+PARSE_CACHE_PATH = './.build-cache/parse-cache.sqlite'
+ASSET_MANIFEST_PATH = './docs/asset-manifest.json'
+IMAGE_CACHE_PATH = './.build-cache/images'
+HIGHLIGHT_CACHE_PATH = './.build-cache/highlight.sqlite'
 
 def copy_tree(src,dst):
     os.makedirs(dst, exist_ok=True)
-    for entry in os.listdir(src):
-        src_path = os.path.join(src,entry)
-        dst_path = os.path.join(dst,entry)
-        
-        if os.path.isdir(src_path):
-            copy_tree(src_path,dst_path)
-        else:
-            shutil.copy2(src_path,dst_path)
+    for entry in walk_files(src):
+        dst_path = os.path.join(dst, entry.rel_path)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        shutil.copy2(entry.path, dst_path)
+
+
+def print_summary(stats):
+    summary = stats.summary(5)
+    counters = summary["counters"]
+    print(f"{counters.get('pages', 0)} pages, {counters.get('bytes_written', 0)} bytes written, {counters.get('html_nodes', 0)} html nodes")
+    for name, seconds in sorted(summary["timers"].items(), key=lambda item: -item[1]):
+        print(f"  {name:<14} {seconds * 1000:10.1f} ms")
+    for page in summary["slowest_pages"]:
+        print(f"  slow: {page['source']} {page['seconds'] * 1000:.1f} ms")
+
+
+def shard_arg(value):
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def manifest_assets(manifest):
+    # the AssetMap pages were built against, from a manifest alone
+    if any("output" in entry or "image" in entry for entry in manifest.assets.values()):
+        return AssetMap('./static', manifest.assets)
+    return None
+
+
+def finish_site(index, basepath, manifest, assets, args, log, stats):
+    # the steps that need every page built: files about the whole site, and
+    # compressing what changed
+    if assets is not None and assets.urls:
+        # original name -> fingerprinted name, for deploy tooling
+        assets.write_json(ASSET_MANIFEST_PATH)
+    elif os.path.exists(ASSET_MANIFEST_PATH):
+        os.remove(ASSET_MANIFEST_PATH)
+    with stats.timer("site_files"):
+        written = write_site_files(index, './docs', basepath, args.site_url, args.search_index, manifest)
+    if log and written:
+        print(f"Site files: {', '.join(written)}")
+    if args.precompress:
+        with stats.timer("precompress"):
+            compressed = precompress_tree('./docs', manifest)
+        if log:
+            print(f"Precompressed: {compressed['compressed']} compressed, {compressed['skipped']} unchanged, "
+                  f"{compressed['removed']} removed; {ratio_summary(compressed)}")
+    elif manifest.compressed:
+        remove_precompressed('./docs', manifest)
+
+
+def merge_shards(paths, args, log, stats):
+    # Combines the manifests of a sharded build into the site's manifest, once
+    # every shard's outputs are in ./docs, then finishes the site as a whole.
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise SystemExit(f"no such shard manifest: {', '.join(missing)}")
+    try:
+        manifest = merge_manifests([Manifest.load(path) for path in paths], MANIFEST_PATH)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    found = discover_pages('./content', './docs', args.ignore)
+    unbuilt = [
+        source for source, output in found
+        if source not in manifest.pages or not os.path.exists(manifest.pages[source]["output"])
+    ]
+    if unbuilt:
+        raise SystemExit("cannot merge shards, these pages were not built:\n  " + "\n  ".join(unbuilt))
+    basepath = manifest.inputs.get("basepath", "/")
+    assets = manifest_assets(manifest)
+    index = build_site_index(found, manifest.pages, './docs', basepath)
+    report_broken_links(found, manifest.pages, './docs', assets)
+    try:
+        finish_site(index, basepath, manifest, assets, args, log, stats)
+    finally:
+        manifest.save()
+    if log:
+        print(f"Merged {len(paths)} shards: {len(manifest.pages)} pages")
+
+
+def searches(args):
+    # whether a site file needs each page's summary and terms
+    return args.search_index or args.site_url is not None
+
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the static site into ./docs")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--clean", action="store_true",
+                        help="ignore the build manifest and rebuild everything")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="render pages in N worker processes (0 = one per CPU)")
+    parser.add_argument("--ignore", action="append", default=[], metavar="PATTERN",
+                        help="skip content and static files matching PATTERN, like drafts/* or *.tmp (repeatable)")
+    parser.add_argument("--static-compare", choices=["mtime", "hash"], default="mtime",
+                        help="how to tell that a static asset changed")
+    parser.add_argument("--link", action="store_true",
+                        help="reflink or hardlink static assets into docs instead of copying them "
+                             "(hardlinked files in docs are the static sources, so never edit them)")
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="name static assets after their content hash and point pages at those names")
+    parser.add_argument("--images", action="store_true",
+                        help="recompress images, emit resized variants and size img tags (variants need Pillow)")
+    parser.add_argument("--highlight", action="store_true",
+                        help="highlight fenced code blocks that name their language (needs Pygments; "
+                             "python3 src/highlight.py prints a stylesheet for them)")
+    parser.add_argument("--site-url", metavar="URL",
+                        help="the site's origin, like https://example.com; writes sitemap.xml and feed.xml")
+    parser.add_argument("--search-index", action="store_true",
+                        help="write search-index.json for client-side search")
+    parser.add_argument("--precompress", action="store_true",
+                        help="write .gz (and .br, with the brotli module) next to text outputs")
+    parser.add_argument("--atomic-writes", action="store_true",
+                        help="write each page to a temporary file and rename it into place")
+    parser.add_argument("--parse-cache", default=PARSE_CACHE_PATH, metavar="PATH",
+                        help="where rendered markdown blocks are cached between builds")
+    parser.add_argument("--parse-cache-size", type=int, default=64, metavar="MB",
+                        help="evict least recently used blocks beyond this size")
+    parser.add_argument("--no-parse-cache", action="store_true",
+                        help="parse every block from scratch")
+    parser.add_argument("--watch", action="store_true",
+                        help="after building, rebuild changed pages and assets as they are edited")
+    parser.add_argument("--watch-interval", type=float, default=0.1, metavar="SECONDS",
+                        help="how often --watch polls for changes")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="don't log every page")
+    parser.add_argument("--shard", type=shard_arg, metavar="I/N",
+                        help="build only the I-th of N slices of the pages (balanced by size) with its own manifest")
+    parser.add_argument("--merge", nargs="+", metavar="MANIFEST",
+                        help="combine the shard manifests of a sharded build, check them and finish the site")
+    parser.add_argument("--explain", metavar="PATH",
+                        help="show what a page, output or template was built from and why, then exit")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="time each build stage and write a JSON summary to PATH")
+    args = parser.parse_args(argv)
+    args.ignore = IGNORE_PATTERNS + tuple(args.ignore)
+    if args.shard is not None and args.watch:
+        parser.error("--watch can't be combined with --shard")
+    return args
 
 
 def main():
-    basepath = sys.argv[1] if len(sys.argv) > 1 else "/"
-    print ("cwd is:", os.getcwd())
-    ##step 1. erase public if it exists and make a new one
-    if os.path.exists('./docs'):
-        shutil.rmtree('./docs')
-    ##step 2. copy all files from static to public
-    copy_tree('./static','./docs')
+    args = parse_args(sys.argv[1:])
+    basepath = args.basepath
+    log = not args.quiet
+    if args.explain:
+        manifest = Manifest.load(MANIFEST_PATH)
+        for line in manifest.explain(args.explain, './docs', manifest_assets(manifest)):
+            print(line)
+        return
+    if log:
+        print ("cwd is:", os.getcwd())
+    stats = instrument.enable() if args.profile else instrument.stats
+    if args.merge:
+        merge_shards(args.merge, args, log, stats)
+        return
+    # each shard keeps its own manifest; the merge step combines them
+    manifest_path = MANIFEST_PATH if args.shard is None else shard_manifest_path(MANIFEST_PATH, args.shard)
+    ##step 1. on --clean erase public and forget what was built before
+    if args.clean:
+        # shards may share ./docs, so a shard only forgets its own pages
+        if os.path.exists('./docs') and args.shard is None:
+            shutil.rmtree('./docs')
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+    manifest = Manifest.load(manifest_path)
+    if not args.no_parse_cache:
+        parse_cache.configure(args.parse_cache, args.parse_cache_size * 1024 * 1024)
+    if args.highlight:
+        if highlight.pygments is None:
+            print("Highlighting needs Pygments; code blocks only get their language class")
+        highlight.configure(HIGHLIGHT_CACHE_PATH)
+    ##step 2. bring static assets in public up to date with static
+    build_start = time.perf_counter()
+    images = ImageCache(IMAGE_CACHE_PATH) if args.images else None
+    with stats.timer("static"):
+        synced = sync_tree('./static', './docs', manifest, args.static_compare, args.link, args.fingerprint, images,
+                           args.ignore)
+    assets = None
+    if args.fingerprint or args.images:
+        assets = AssetMap('./static', manifest.assets)
+    if log:
+        print(f"Static assets: {synced['copied']} copied, {synced['linked']} linked, {synced['skipped']} unchanged, {synced['removed']} removed")
+        if images is not None:
+            print(f"Images: {images.processed} processed, {len(assets.images)} sized")
     #generate_page('content/index.md', 'template.html', 'public/index.html' )
-    generate_pages_recursive('./content', 'template.html', './docs', basepath)
+    ##step 3. render only the pages whose source, template or basepath changed
+    try:
+        index = generate_pages_recursive(
+            './content', 'template.html', './docs', basepath, manifest, args.jobs, log, args.atomic_writes, assets, args.shard,
+            args.ignore, searches(args)
+        )
+        ##step 4. site-wide files and precompression; a sharded build leaves them to --merge
+        if args.shard is None:
+            finish_site(index, basepath, manifest, assets, args, log, stats)
+    finally:
+        # keep whatever finished so a failed build doesn't redo it next time
+        manifest.save()
+    # trim the caches to their budgets, once per build
+    if parse_cache.cache is not None:
+        parse_cache.cache.close()
+    if highlight.highlighter is not None:
+        highlight.highlighter.close()
+    stats.add_time("total", time.perf_counter() - build_start)
+    if log and parse_cache.cache is not None:
+        cached = parse_cache.cache.stats()
+        print(f"Parse cache: {cached['hits']} hits, {cached['misses']} misses, {cached['entries']} blocks ({cached['bytes']} bytes)")
+    if log and highlight.highlighter is not None:
+        cached = highlight.highlighter.cache.stats()
+        print(f"Highlight cache: {cached['hits']} hits, {cached['misses']} misses, {cached['entries']} snippets")
+    if args.profile:
+        stats.write_json(args.profile)
+        print_summary(stats)
+    if args.watch:
+        watcher = Watcher('./content', './static', 'template.html', './docs', basepath, manifest, args.link, log,
+                          assets, args.fingerprint, images, args.precompress, args.ignore, searches(args), index)
+        watcher.watch(args.watch_interval)
 
-main ()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
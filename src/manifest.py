@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+
+from link_check import broken_links
+
+MANIFEST_VERSION = 5
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remove_output(path, root):
+    if os.path.exists(path):
+        os.remove(path)
+    # drop directories the removed page leaves empty, but never the root itself
+    root = os.path.abspath(root)
+    parent = os.path.dirname(os.path.abspath(path))
+    while parent != root and parent.startswith(root + os.sep):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+
+class Manifest:
+    def __init__(self, path=None, inputs=None, pages=None, assets=None, compressed=None, removed=None):
+        self.path = path
+        self.inputs = inputs or {}
+        self.pages = pages or {}
+        self.assets = assets or {}
+        # output path (relative to the output root) -> precompressed suffixes
+        self.compressed = compressed or {}
+        # outputs removed since links were last checked; pages linking to
+        # them are checked again
+        self.removed = set(removed or [])
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(
+            path, data.get("inputs", {}), data.get("pages", {}), data.get("assets", {}), data.get("compressed", {}),
+            data.get("removed", []),
+        )
+
+    def save(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "inputs": self.inputs,
+            "pages": self.pages,
+            "assets": self.assets,
+            "compressed": self.compressed,
+            "removed": sorted(self.removed),
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    # pages is the build's dependency graph: for each source, the output it
+    # produced, the hash of every file that output was built from (the page,
+    # its template and the template's partials), the URLs it links to, why
+    # it was last rebuilt, the summary and terms search and feeds use (when
+    # one of them is written), and the title and front matter the site
+    # index is built from. The link check adds the URLs that were broken
+    # when it last looked.
+
+    def use_inputs(self, inputs):
+        # settings that affect every page, like the basepath
+        changed = sorted(name for name in set(inputs) | set(self.inputs) if inputs.get(name) != self.inputs.get(name))
+        if not changed:
+            return
+        self.inputs = inputs
+        for entry in self.pages.values():
+            entry["deps"] = None
+            entry["reason"] = f"{', '.join(changed)} changed"
+
+    def stale_reason(self, source, output, deps, extra=None):
+        # Why the output of source must be rebuilt, or None if it is fresh.
+        # deps are the inputs every build knows up front; extra holds current
+        # hashes of inputs a page only picks up while rendering (its assets).
+        entry = self.pages.get(source)
+        if entry is None:
+            return "new page"
+        if entry["deps"] is None:
+            return entry["reason"]
+        if entry["output"] != output:
+            return "output path changed"
+        if not os.path.exists(output):
+            return "output missing"
+        for path, digest in deps.items():
+            if path not in entry["deps"]:
+                return f"now depends on {path}"
+            if entry["deps"][path] != digest:
+                return f"{path} changed"
+        extra = extra or {}
+        for path, digest in entry["deps"].items():
+            if path in deps:
+                continue
+            if path not in extra:
+                return f"no longer depends on {path}"
+            if extra[path] != digest:
+                return f"{path} changed"
+        return None
+
+    def record(self, source, output, deps, links=None, reason=None, search=None, title=None, front_matter=None):
+        self.pages[source] = {
+            "output": output,
+            "deps": deps,
+            "links": links or [],
+            "reason": reason,
+            "search": search,
+            "title": title,
+            "front_matter": front_matter or {},
+        }
+
+    def remove_output(self, path, root):
+        remove_output(path, root)
+        self.removed.add(os.path.normpath(path))
+
+    def forget(self, source):
+        return self.pages.pop(source, None)
+
+    def dependents(self, path):
+        # sources whose output was built from path
+        return sorted(source for source, entry in self.pages.items() if entry["deps"] and path in entry["deps"])
+
+    def find(self, path):
+        # the source for a source or output path
+        path = os.path.normpath(path)
+        if path in self.pages:
+            return path
+        for source, entry in self.pages.items():
+            if os.path.normpath(entry["output"]) == path:
+                return source
+        return None
+
+    def explain(self, path, dest_dir, assets=None):
+        # Lines describing how path (a page, an output or a shared input like
+        # the template) fits into the dependency graph.
+        source = self.find(path)
+        if source is None:
+            path = os.path.normpath(path)
+            dependents = self.dependents(path)
+            if not dependents:
+                return [f"{path} is not part of the last build"]
+            lines = [f"{path} is used by {len(dependents)} page(s):"]
+            for dependent in dependents:
+                lines.append(f"  {self.pages[dependent]['output']} (from {dependent})")
+            return lines
+        entry = self.pages[source]
+        lines = [
+            f"{entry['output']}",
+            f"  built from {source}",
+            f"  last rebuilt because: {entry['reason']}",
+            "  depends on:",
+        ]
+        for dep, digest in sorted((entry["deps"] or {}).items()):
+            lines.append(f"    {dep} {digest[:12] if digest else '(unknown)'}")
+        broken = {url for _, url in broken_links([(source, entry["output"], entry["links"])], dest_dir, assets)}
+        if entry["links"]:
+            lines.append("  links to:")
+            for url in dict.fromkeys(entry["links"]):
+                lines.append(f"    {url}{' (missing)' if url in broken else ''}")
+        return lines
+
+    def __repr__(self):
+        return f"Manifest({self.path}, {len(self.pages)} pages)"
@@ -0,0 +1,71 @@
+import contextlib
+import mmap
+
+from frontmatter import FENCE, parse_front_matter
+
+# Pages are read through a memory map instead of into one big str: block
+# boundaries are found with bytes.find on the mapping and only the block
+# being converted is ever decoded, so a page never sits in memory as both
+# a str and a list of its lines.
+
+BLOCK_SEPARATOR = b"\n\n"
+
+
+@contextlib.contextmanager
+def map_source(path):
+    # the file's bytes, mapped read-only; b"" for an empty file, which
+    # can't be mapped
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b""
+            return
+        try:
+            yield data
+        finally:
+            data.close()
+
+
+def mapped_front_matter(data):
+    # (metadata, offset of the body) for mapped page bytes
+    if data[: len(FENCE)] != FENCE.encode():
+        return {}, 0
+    ends = []
+
+    def lines():
+        pos = 0
+        while pos < len(data):
+            end = data.find(b"\n", pos) + 1 or len(data)
+            ends.append(end)
+            yield data[pos:end].decode("utf-8")
+            pos = end
+
+    source = lines()
+    metadata, rest = parse_front_matter(source)
+    if rest is not source:
+        # parse_front_matter only hands back the line iterator itself after a
+        # closing fence; otherwise the page just starts with a rule
+        return {}, 0
+    return metadata, ends[-1] if ends else len(data)
+
+
+def mapped_blocks(data, start=0):
+    # Yields the text of each block, split into lines, like iter_blocks does
+    # for the same bytes read as text: blocks end at an empty line, so at
+    # "\n\n", and the newlines left over from longer runs are stripped.
+    pos = start
+    size = len(data)
+    while pos < size:
+        end = data.find(BLOCK_SEPARATOR, pos)
+        if end == -1:
+            end = size
+        block = data[pos:end].strip(b"\n")
+        pos = end + len(BLOCK_SEPARATOR)
+        if block:
+            yield block.decode("utf-8").split("\n")
+
+
+def has_carriage_returns(data, start=0):
+    # reading as text turns "\r\n" and "\r" into "\n"; mapped bytes don't
+    return data.find(b"\r", start) != -1
@@ -1,8 +1,14 @@
 from enum import Enum
-import os
-from htmlnode import ParentNode
+import contextlib
+from htmlnode import HTMLNode, LeafNode, ParentNode
 from inline_markdown import text_to_textnodes
 from textnode import text_node_to_html_node, TextNode, TextType
+from links import LinkResolver
+import instrument
+import parse_cache
+import highlight
+from frontmatter import parse_front_matter, split_front_matter
+from mapped_source import has_carriage_returns, map_source, mapped_blocks, mapped_front_matter
 
 
 class BlockType(Enum):
@@ -25,24 +31,64 @@ def markdown_to_blocks(markdown):
     return filtered_blocks
 
 
+def iter_blocks(lines):
+    # Yields (block_type, block_lines) one block at a time, so only the block
+    # being converted is ever held in memory. Blocks are separated by empty
+    # lines and stripped like markdown_to_blocks strips them.
+    block = []
+    for line in lines:
+        if line.endswith("\n"):
+            line = line[:-1]
+        if line == "":
+            if block:
+                yield _typed_block(block)
+                block = []
+            continue
+        block.append(line)
+    if block:
+        yield _typed_block(block)
+
+
+def _typed_block(lines):
+    start = 0
+    while start < len(lines) and (lines[start] == "" or lines[start].isspace()):
+        start += 1
+    end = len(lines)
+    while end > start and (lines[end - 1] == "" or lines[end - 1].isspace()):
+        end -= 1
+    if start == end:
+        lines = [""]
+    else:
+        lines = lines[start:end]
+        lines[0] = lines[0].lstrip()
+        lines[-1] = lines[-1].rstrip()
+    with instrument.stats.timer("block_type"):
+        block_type = lines_to_block_type(lines)
+    return block_type, lines
+
+
 def block_to_block_type(block):
-    lines = block.split("\n")
+    return lines_to_block_type(block.split("\n"))
+
+
+def lines_to_block_type(lines):
+    first = lines[0]
 
-    if block.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
+    if first.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
         return BlockType.HEADING
-    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+    if len(lines) > 1 and first.startswith("```") and lines[-1].startswith("```"):
         return BlockType.CODE
-    if block.startswith(">"):
+    if first.startswith(">"):
         for line in lines:
             if not line.startswith(">"):
                 return BlockType.PARAGRAPH
         return BlockType.QUOTE
-    if block.startswith("- "):
+    if first.startswith("- "):
         for line in lines:
             if not line.startswith("- "):
                 return BlockType.PARAGRAPH
         return BlockType.ULIST
-    if block.startswith("1. "):
+    if first.startswith("1. "):
         i = 1
         for line in lines:
             if not line.startswith(f"{i}. "):
@@ -52,49 +98,216 @@ def block_to_block_type(block):
     return BlockType.PARAGRAPH
 
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
+class Document:
+    # What one parse of a page produces: the content tree plus what the
+    # template needs to know about it, so nothing re-reads the markdown.
+    def __init__(self, node, title=None, headings=None, metadata=None, front_matter=None):
+        self.node = node
+        self.title = title
+        self.headings = headings or []
+        self.metadata = metadata or {}
+        self.front_matter = front_matter or {}
+
+    def template_values(self):
+        return page_values(self.title, self.front_matter, self.node)
+
+    def __repr__(self):
+        return f"Document({self.title}, {len(self.headings)} headings, {self.metadata})"
+
+
+def markdown_to_html_node(markdown, resolver=None):
+    return markdown_to_document(markdown, resolver).node
+
+
+def page_values(title, front_matter, content):
+    # front matter fields are available to the template under their own names
+    values = {}
+    for key, value in front_matter.items():
+        values[key] = value if isinstance(value, str) else ", ".join(value)
+    values["Title"] = title
+    values["Content"] = content
+    return values
+
+
+def markdown_to_document(markdown, resolver=None):
+    front_matter, markdown = split_front_matter(markdown)
+    return blocks_to_document(front_matter, iter_blocks(markdown.split("\n")), resolver)
+
+
+@contextlib.contextmanager
+def open_page(from_path):
+    # (front matter, blocks) for a page file. The blocks are found on a memory
+    # map and decoded one at a time; only files with "\r" newlines are read as
+    # text instead, which translates them.
+    with map_source(from_path) as data:
+        if not has_carriage_returns(data):
+            with instrument.stats.timer("read"):
+                front_matter, start = mapped_front_matter(data)
+            yield front_matter, (_typed_block(lines) for lines in mapped_blocks(data, start))
+            return
+    with open(from_path, encoding="utf-8") as f:
+        front_matter, rest = parse_front_matter(f)
+        yield front_matter, iter_blocks(rest)
+
+
+def read_document(from_path, resolver=None):
+    # markdown_to_document for a file, without reading it into one str
+    with open_page(from_path) as (front_matter, blocks):
+        return blocks_to_document(front_matter, blocks, resolver)
+
+
+def blocks_to_document(front_matter, blocks, resolver=None):
+    stats = instrument.stats
+    document = Document(None, metadata={"blocks": 0, "words": 0}, front_matter=front_matter)
+    blocks = stats.iterate("block_split", blocks)
+    if parse_cache.cache is None:
+        children = []
+        for block_type, lines in blocks:
+            scan_block(document, block_type, lines)
+            html_node = lines_to_html_node(block_type, lines, resolver)
+            if stats.enabled:
+                stats.count("html_nodes", instrument.count_nodes(html_node))
+            children.append(html_node)
+    else:
+        # metadata comes from the block text, so cached blocks still report it
+        blocks = list(blocks)
+        for block_type, lines in blocks:
+            scan_block(document, block_type, lines)
+        children = cached_blocks_to_html_nodes(blocks, resolver, parse_cache.cache)
+    document.node = ParentNode("div", children, None)
+    if "title" in front_matter:
+        document.title = front_matter["title"]
+    return document
+
+
+def scan_block(document, block_type, lines):
+    metadata = document.metadata
+    metadata["blocks"] += 1
+    words = 0
+    for line in lines:
+        words += len(line.split())
+    # leave out the markdown markers: "#", "- ", "1. " and the code fences
+    if block_type in (BlockType.OLIST, BlockType.ULIST):
+        words -= len(lines)
+    elif block_type == BlockType.CODE:
+        words -= 2
+    elif block_type == BlockType.HEADING:
+        words -= 1
+    metadata["words"] += words
+    if block_type != BlockType.HEADING:
+        return
+    block = "\n".join(lines)
+    level = len(block) - len(block.lstrip("#"))
+    document.headings.append((level, block[level + 1 :].strip()))
+    if level == 1 and document.title is None:
+        document.title = block[2:].strip()
+
+
+def cached_blocks_to_html_nodes(blocks, resolver, cache):
+    # Rendered links depend on the resolver, so it is part of every key. The
+    # html_nodes counter only counts the nodes of blocks that missed, the
+    # ones built; a hit is wrapped as it is.
+    stats = instrument.stats
+    salt = (resolver.cache_key() if resolver is not None else "") + highlight.cache_key()
+    keys = [parse_cache.block_key("\n".join(lines), salt) for block_type, lines in blocks]
+    found = cache.get_many(keys)
+    links = resolver.links if resolver is not None else None
+    text = resolver.text if resolver is not None else None
     children = []
-    for block in blocks:
-        html_node = block_to_html_node(block)
-        children.append(html_node)
-    return ParentNode("div", children, None)
+    for key, (block_type, lines) in zip(keys, blocks):
+        cached = found.get(key)
+        if cached is None:
+            # A hit skips the resolver, so the block's links and text are cached
+            # with it. They are recorded even when this page doesn't want them,
+            # since the next page to hit the block might.
+            block_links, block_text = [], []
+            block_resolver = None
+            if resolver is not None:
+                block_resolver = LinkResolver(resolver.basepath, block_links, resolver.assets, block_text)
+            html_node = lines_to_html_node(block_type, lines, block_resolver)
+            if stats.enabled:
+                stats.count("html_nodes", instrument.count_nodes(html_node))
+            html = html_node.to_html()
+            cached = (html, block_links, block_text)
+            cache.put(key, *cached)
+            found[key] = cached
+        if links is not None:
+            links.extend(cached[1])
+        if text is not None:
+            text.extend(cached[2])
+        children.append(LeafNode(None, cached[0]))
+    cache.flush()
+    return children
+
+
+class MarkdownStream(HTMLNode):
+    # Renders a markdown line stream, or blocks already split from one, as it
+    # is serialized instead of building the whole tree first; peak memory is
+    # bounded by the largest block.
+    __slots__ = ("lines", "resolver", "blocks")
 
+    def __init__(self, lines, resolver=None, blocks=None):
+        super().__init__("div", None, None, None)
+        self.lines = lines
+        self.resolver = resolver
+        self.blocks = blocks
 
-def block_to_html_node(block):
-    block_type = block_to_block_type(block)
+    def write_parts(self, write):
+        write("<div>")
+        blocks = self.blocks if self.blocks is not None else iter_blocks(self.lines)
+        stats = instrument.stats
+        for block_type, lines in stats.iterate("block_split", blocks):
+            html_node = lines_to_html_node(block_type, lines, self.resolver)
+            if stats.enabled:
+                stats.count("html_nodes", instrument.count_nodes(html_node))
+            html_node.write_parts(write)
+        write("</div>")
+
+    def __repr__(self):
+        return f"MarkdownStream({self.lines})"
+
+
+def block_to_html_node(block, resolver=None):
+    lines = block.split("\n")
+    return lines_to_html_node(lines_to_block_type(lines), lines, resolver)
+
+
+def lines_to_html_node(block_type, lines, resolver=None):
     if block_type == BlockType.PARAGRAPH:
-        return paragraph_to_html_node(block)
+        return paragraph_to_html_node(lines, resolver)
     if block_type == BlockType.HEADING:
-        return heading_to_html_node(block)
+        return heading_to_html_node(lines, resolver)
     if block_type == BlockType.CODE:
-        return code_to_html_node(block)
+        return code_to_html_node(lines)
     if block_type == BlockType.OLIST:
-        return olist_to_html_node(block)
+        return olist_to_html_node(lines, resolver)
     if block_type == BlockType.ULIST:
-        return ulist_to_html_node(block)
+        return ulist_to_html_node(lines, resolver)
     if block_type == BlockType.QUOTE:
-        return quote_to_html_node(block)
+        return quote_to_html_node(lines, resolver)
     raise ValueError("invalid block type")
 
 
-def text_to_children(text):
-    text_nodes = text_to_textnodes(text)
+def text_to_children(text, resolver=None):
+    with instrument.stats.timer("inline_parse"):
+        text_nodes = text_to_textnodes(text)
+    if resolver is not None:
+        resolver.add_text(text_nodes)
     children = []
     for text_node in text_nodes:
-        html_node = text_node_to_html_node(text_node)
+        html_node = text_node_to_html_node(text_node, resolver)
         children.append(html_node)
     return children
 
 
-def paragraph_to_html_node(block):
-    lines = block.split("\n")
+def paragraph_to_html_node(lines, resolver=None):
     paragraph = " ".join(lines)
-    children = text_to_children(paragraph)
+    children = text_to_children(paragraph, resolver)
     return ParentNode("p", children)
 
 
-def heading_to_html_node(block):
+def heading_to_html_node(lines, resolver=None):
+    block = "\n".join(lines)
     level = 0
     for char in block:
         if char == "#":
@@ -104,85 +317,62 @@ def heading_to_html_node(block):
     if level + 1 >= len(block):
         raise ValueError(f"invalid heading level: {level}")
     text = block[level + 1 :]
-    children = text_to_children(text)
+    children = text_to_children(text, resolver)
     return ParentNode(f"h{level}", children)
 
 
-def code_to_html_node(block):
-    if not block.startswith("```") or not block.endswith("```"):
+def code_to_html_node(lines):
+    if not lines[0].startswith("```") or not lines[-1].endswith("```"):
         raise ValueError("invalid code block")
-    text = block[4:-3]
+    # the info string after the opening fence names the language
+    language = highlight.code_language(lines[0][3:])
+    last = lines[-1][:-3]
+    text = "\n".join(lines[1:-1] + [last]) if last else "\n".join(lines[1:-1]) + "\n"
+    props = {"class": f"language-{language}"} if language is not None else None
+    if highlight.highlighter is not None:
+        html = highlight.highlighter.highlight(language, text)
+        if html is not None:
+            return ParentNode("pre", [LeafNode("code", html, props)], {"class": "highlight"})
     raw_text_node = TextNode(text, TextType.TEXT)
     child = text_node_to_html_node(raw_text_node)
-    code = ParentNode("code", [child])
+    code = ParentNode("code", [child], props)
     return ParentNode("pre", [code])
 
 
-def olist_to_html_node(block):
-    items = block.split("\n")
+def olist_to_html_node(lines, resolver=None):
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[3:]
-        children = text_to_children(text)
+        children = text_to_children(text, resolver)
         html_items.append(ParentNode("li", children))
     return ParentNode("ol", html_items)
 
 
-def ulist_to_html_node(block):
-    items = block.split("\n")
+def ulist_to_html_node(lines, resolver=None):
     html_items = []
-    for item in items:
+    for item in lines:
         text = item[2:]
-        children = text_to_children(text)
+        children = text_to_children(text, resolver)
         html_items.append(ParentNode("li", children))
     return ParentNode("ul", html_items)
 
 
-def quote_to_html_node(block):
-    lines = block.split("\n")
+def quote_to_html_node(lines, resolver=None):
     new_lines = []
     for line in lines:
         if not line.startswith(">"):
             raise ValueError("invalid quote block")
         new_lines.append(line.lstrip(">").strip())
     content = " ".join(new_lines)
-    children = text_to_children(content)
+    children = text_to_children(content, resolver)
     return ParentNode("blockquote", children)
 
 def extract_title(markdown):
-    blocks = markdown_to_blocks(markdown)
-    for block in blocks:
-        if block.startswith("# "):
-            return block[2:].strip()
-    raise Exception ("no header")
+    return extract_title_from_lines(markdown.split("\n"))
 
-def generate_page(from_path, template_path, dest_path, basepath):
-    print (f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path) as f:
-        from_data = f.read()
-    with open(template_path) as t:
-        template_data = t.read()
-    markdown_htmlnode = markdown_to_html_node(from_data)
-    content_html = markdown_htmlnode.to_html()
-    title = extract_title(from_data)
-    page = template_data.replace("{{ Title }}", title)
-    page = page.replace("{{ Content }}", content_html)
-    page = page.replace('href="/', f'href="{basepath}')
-    page = page.replace('src="/', f'src="{basepath}')
-    dest_dir = os.path.dirname(dest_path)
-    if dest_dir and not os.path.isdir(dest_dir):
-        os.makedirs(dest_dir, exist_ok=True)
-    with open(dest_path, 'w') as d:
-        d.write(page)
-    
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-    for root, dirs, files in os.walk(dir_path_content):
-        for file in files:
-            if file.endswith(".md"):
-                from_path = os.path.join(root, file)
-                
-                # Compute the relative path to preserve folder structure
-                relative_path = os.path.relpath(from_path, dir_path_content)
-                dest_path = os.path.join(dest_dir_path, os.path.splitext(relative_path)[0] + ".html")
-                
-                generate_page(from_path, template_path, dest_path, basepath)
\ No newline at end of file
+def extract_title_from_lines(lines):
+    # stops reading at the first h1, so large files are only scanned up to it
+    for block_type, block_lines in iter_blocks(lines):
+        if block_lines[0].startswith("# "):
+            return "\n".join(block_lines)[2:].strip()
+    raise Exception ("no header")
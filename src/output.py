@@ -0,0 +1,124 @@
+import contextlib
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import instrument
+
+# Rendered pages go through an OutputWriter, which writes them from a small
+# thread pool so rendering the next page overlaps with writing this one.
+
+WRITE_THREADS = 4
+
+
+class OutputWriter:
+    def __init__(self, threads=WRITE_THREADS, atomic=False):
+        # threads=0 writes inline, for callers that are already parallel
+        self.atomic = atomic
+        self.executor = ThreadPoolExecutor(max_workers=threads) if threads > 0 else None
+        self.lock = threading.Lock()
+        self.dirs = set()
+        self.written = 0
+        self.unchanged = 0
+
+    def submit(self, path, data):
+        # Returns a future that resolves to True when the file was written
+        # and False when it already held exactly these bytes.
+        if self.executor is not None:
+            return self.executor.submit(self.write, path, data)
+        try:
+            return completed(self.write(path, data))
+        except Exception as e:
+            return completed(exception=e)
+
+    def write(self, path, data):
+        start = time.perf_counter()
+        self.make_dir(os.path.dirname(path))
+        changed = not same_contents(path, data)
+        if changed:
+            with open_output(path, "wb", self.atomic) as f:
+                f.write(data)
+        with self.lock:
+            if changed:
+                self.written += 1
+            else:
+                self.unchanged += 1
+            instrument.stats.add_time("write", time.perf_counter() - start)
+        return changed
+
+    @contextlib.contextmanager
+    def open(self, path):
+        # for pages streamed straight to disk instead of rendered in memory
+        self.make_dir(os.path.dirname(path))
+        with open_output(path, "w", self.atomic) as f:
+            yield f
+        with self.lock:
+            self.written += 1
+
+    def make_dir(self, path):
+        # each output directory is created once per build, not once per page
+        if not path or path in self.dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        with self.lock:
+            self.dirs.add(path)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def __repr__(self):
+        return f"OutputWriter({self.written} written, {self.unchanged} unchanged, atomic={self.atomic})"
+
+
+def completed(result=None, exception=None):
+    future = Future()
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+    return future
+
+
+def same_contents(path, data):
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def break_link(path):
+    # A static asset installed with --link as a hardlink shares its inode
+    # with the file in static/; writing into it in place would overwrite the
+    # source, so it is unlinked first and the write gets a file of its own.
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextlib.contextmanager
+def open_output(path, mode="w", atomic=False):
+    # In atomic mode the file is written next to its destination and renamed
+    # over it only once complete, so docs/ never holds a half-written page.
+    # Text is always written as UTF-8, like pages rendered to bytes.
+    encoding = None if "b" in mode else "utf-8"
+    if not atomic:
+        break_link(path)
+        with open(path, mode, encoding=encoding) as f:
+            yield f
+        return
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+import instrument
+
+# The parse cache maps the hash of a markdown block to the HTML it renders to.
+# It lives in a small SQLite file so worker processes can share it, and is
+# keyed by a fingerprint of the parser's own source so any parser change
+# starts from an empty cache.
+
+# only the modules that decide what a block renders to; how builds find,
+# schedule and write pages lives in build.py, outside the fingerprint
+PARSER_MODULES = ["markdown_blocks.py", "inline_markdown.py", "textnode.py", "htmlnode.py", "links.py", "highlight.py"]
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# bumped whenever the blocks table changes shape
+SCHEMA_VERSION = 4
+
+# what a row's size and used columns take, on top of its text
+ROW_OVERHEAD = 16
+
+
+def parser_fingerprint():
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in PARSER_MODULES:
+        with open(os.path.join(here, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def row_size(key, html, links, text):
+    # bytes a blocks row stores; links and text are already joined
+    return sum(len(value.encode()) for value in (key, html, links, text)) + ROW_OVERHEAD
+
+
+def block_key(text, salt=""):
+    return hashlib.blake2b(f"{salt}\0{text}".encode(), digest_size=16).hexdigest()
+
+
+class ParseCache:
+    def __init__(self, path, version=None, max_bytes=DEFAULT_MAX_BYTES, name="parse_cache"):
+        self.path = path
+        self.version = f"{SCHEMA_VERSION}:{version or parser_fingerprint()}"
+        self.max_bytes = max_bytes
+        # prefix of the hit and miss counters in build stats
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._pid = None
+        self._pending = {}
+        self._used = set()
+
+    def connection(self):
+        # connections must not cross a fork, so each process opens its own
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        with conn:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if row is None or row[0] != self.version:
+                conn.execute("DROP TABLE IF EXISTS blocks")
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('bytes', 0)")
+            # links holds the URLs the block uses and text its plain text
+            # fragments, one per line; size is the whole row's, see row_size
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blocks"
+                " (key TEXT PRIMARY KEY, html TEXT, links TEXT, text TEXT, size INTEGER, used REAL)"
+            )
+        self._conn = conn
+        self._pid = os.getpid()
+        self._pending = {}
+        self._used = set()
+        return conn
+
+    def get_many(self, keys):
+        # {key: (html, links, text)} for the keys that are cached
+        conn = self.connection()
+        found = {key: self._pending[key] for key in keys if key in self._pending}
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        # stay well under SQLite's bound-parameter limit
+        for start in range(0, len(missing), 500):
+            chunk = missing[start : start + 500]
+            marks = ",".join("?" * len(chunk))
+            query = f"SELECT key, html, links, text FROM blocks WHERE key IN ({marks})"
+            for key, html, links, text in conn.execute(query, chunk):
+                found[key] = (html, links.split("\n") if links else [], text.split("\n") if text else [])
+                self._used.add(key)
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        instrument.stats.count(f"{self.name}_hits", hits)
+        instrument.stats.count(f"{self.name}_misses", len(keys) - hits)
+        return found
+
+    def put(self, key, html, links=(), text=()):
+        self._pending[key] = (html, list(links), list(text))
+
+    def flush(self):
+        if self._conn is None or self._pid != os.getpid():
+            return
+        if not self._pending and not self._used:
+            return
+        now = time.time()
+        conn = self._conn
+        with conn:
+            # The table's total size is kept as a running count in meta, so no
+            # flush has to add up the whole table. Blocks another process
+            # cached in the meantime are ignored, not counted twice.
+            added = 0
+            for key, (html, links, text) in self._pending.items():
+                links, text = "\n".join(links), "\n".join(text)
+                size = row_size(key, html, links, text)
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO blocks VALUES (?, ?, ?, ?, ?, ?)", (key, html, links, text, size, now)
+                )
+                added += size * cursor.rowcount
+            if added:
+                conn.execute("UPDATE meta SET value = value + ? WHERE name = 'bytes'", (added,))
+            conn.executemany("UPDATE blocks SET used = ? WHERE key = ?", [(now, key) for key in self._used])
+        self._pending = {}
+        self._used = set()
+
+    def total_bytes(self, conn):
+        return int(conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0])
+
+    def evict(self):
+        # Drops least recently used blocks until the table is back under its
+        # budget. Run once per build, from close(), not on every flush.
+        conn = self.connection()
+        with conn:
+            excess = self.total_bytes(conn) - self.max_bytes
+            if excess <= 0:
+                return
+            removed = 0
+            doomed = []
+            for key, size in conn.execute("SELECT key, size FROM blocks ORDER BY used"):
+                doomed.append((key,))
+                removed += size
+                if removed >= excess:
+                    break
+            conn.executemany("DELETE FROM blocks WHERE key = ?", doomed)
+            conn.execute("UPDATE meta SET value = value - ? WHERE name = 'bytes'", (removed,))
+
+    def stats(self):
+        conn = self.connection()
+        entries = conn.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": self.total_bytes(conn)}
+
+    def close(self):
+        # the end of a build: write what's pending and trim to the budget
+        self.flush()
+        self.evict()
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def __repr__(self):
+        return f"ParseCache({self.path}, {self.hits} hits, {self.misses} misses)"
+
+
+cache = None
+
+
+def configure(path, max_bytes=DEFAULT_MAX_BYTES):
+    global cache
+    if cache is not None and cache.path == path and cache.max_bytes == max_bytes:
+        return cache
+    if cache is not None:
+        cache.close()
+    cache = ParseCache(path, max_bytes=max_bytes)
+    return cache
+
+
+def settings():
+    if cache is None:
+        return None
+    return (cache.path, cache.max_bytes)
+
+
+def disable():
+    global cache
+    if cache is not None:
+        cache.close()
+    cache = None
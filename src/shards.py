@@ -0,0 +1,75 @@
+import heapq
+import os
+
+from manifest import Manifest
+
+# A sharded build splits the pages of one site across independent builds,
+# each with its own manifest. Every shard computes the same split from the
+# content tree, so shards never need to talk to each other; merging their
+# manifests afterwards checks that together they built each page once.
+
+
+def parse_shard(value):
+    # "2/4" -> (2, 4); shards are numbered from 1
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard {value!r}, expected i/N like 1/4")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"invalid shard {value!r}, i must be between 1 and N")
+    return index, count
+
+
+def shard_manifest_path(manifest_path, shard):
+    # ./.build-manifest.json -> ./.build-manifest.shard2of4.json
+    root, ext = os.path.splitext(manifest_path)
+    return f"{root}.shard{shard[0]}of{shard[1]}{ext}"
+
+
+def partition(sizes, count):
+    # Splits {path: size} into count lists with close to equal total size:
+    # largest pages first, each to the shard with the fewest bytes so far.
+    # Ties go by path and shard number, so every shard gets the same answer.
+    shards = [[] for _ in range(count)]
+    loads = [(0, number) for number in range(count)]
+    for path in sorted(sizes, key=lambda path: (-sizes[path], path)):
+        load, number = heapq.heappop(loads)
+        shards[number].append(path)
+        heapq.heappush(loads, (load + sizes[path], number))
+    return [sorted(paths) for paths in shards]
+
+
+def shard_sources(sizes, shard):
+    # the sources in {source: size} the given (index, count) shard builds
+    index, count = shard
+    return set(partition(sizes, count)[index - 1])
+
+
+def merge_manifests(manifests, path=None):
+    # One manifest for the whole site from the shards' manifests. Raises
+    # ValueError when the shards disagree: different settings, a page or
+    # output claimed by two shards, or a static asset installed differently.
+    problems = []
+    merged = Manifest(path)
+    if manifests:
+        merged.inputs = manifests[0].inputs
+    outputs = {}
+    for manifest in manifests:
+        if manifest.inputs != merged.inputs:
+            problems.append(f"{manifest.path} was built with {manifest.inputs}, not {merged.inputs}")
+        for source, entry in sorted(manifest.pages.items()):
+            output = os.path.normpath(entry["output"])
+            if source in merged.pages:
+                problems.append(f"{source} was built by more than one shard")
+            elif output in outputs:
+                problems.append(f"{output} is written by both {outputs[output]} and {source}")
+            else:
+                merged.pages[source] = entry
+                outputs[output] = source
+        for rel_path, entry in manifest.assets.items():
+            seen = merged.assets.setdefault(rel_path, entry)
+            if seen.get("output") != entry.get("output") or seen.get("image") != entry.get("image"):
+                problems.append(f"shards installed static asset {rel_path} differently")
+    if problems:
+        raise ValueError("cannot merge shards:\n  " + "\n  ".join(problems))
+    return merged
@@ -0,0 +1,180 @@
+import datetime
+import json
+import os
+import re
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+from output import OutputWriter
+
+# Files that describe the whole site: sitemap.xml, an RSS feed and a search
+# index for client-side search. They are built from the SiteIndex plus what
+# each page's render recorded about its text, so nothing re-reads a page.
+
+SUMMARY_LENGTH = 200
+# terms kept per page; the rest are too rare in it to rank the page
+PAGE_TERMS = 100
+TITLE_WEIGHT = 5
+FEED_ENTRIES = 20
+SEARCH_INDEX_BUDGET = 256 * 1024
+
+SITEMAP_NAME = "sitemap.xml"
+FEED_NAME = "feed.xml"
+SEARCH_INDEX_NAME = "search-index.json"
+
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOP_WORDS = set(
+    "a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our "
+    "she so that the their them then there they this to was we were what when which who will with you your".split()
+)
+
+
+def terms(text):
+    return [word for word in WORD_RE.findall(text.lower()) if len(word) > 1 and word not in STOP_WORDS]
+
+
+def page_search(text):
+    # What the search index and feed need from a page's plain text fragments:
+    # a summary and its most frequent terms with their counts.
+    counts = {}
+    for fragment in text:
+        for term in terms(fragment):
+            counts[term] = counts.get(term, 0) + 1
+    top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:PAGE_TERMS]
+    return {"summary": summarize(text), "terms": dict(top)}
+
+
+def summarize(fragments):
+    summary = ""
+    for fragment in fragments:
+        summary = f"{summary} {fragment}" if summary else fragment
+        if len(summary) > SUMMARY_LENGTH:
+            # cut at a word boundary
+            return summary[:SUMMARY_LENGTH].rsplit(" ", 1)[0] + "…"
+    return summary
+
+
+def page_date(entry):
+    # the front matter date as a datetime, or None
+    value = entry["metadata"].get("date")
+    if not isinstance(value, str):
+        return None
+    try:
+        date = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return date
+
+
+def absolute_url(site_url, url):
+    return site_url.rstrip("/") + url
+
+
+def sitemap_xml(index, site_url):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for entry in sorted(index, key=lambda entry: entry["url"]):
+        lines.append(f"  <url><loc>{escape(absolute_url(site_url, entry['url']))}</loc>")
+        date = page_date(entry)
+        if date is not None:
+            lines.append(f"    <lastmod>{date.date().isoformat()}</lastmod>")
+        lines.append("  </url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+
+def feed_xml(index, site_url, basepath="/"):
+    # RSS 2.0: the newest dated pages, or every page when none has a date
+    entries = [entry for entry in index if page_date(entry) is not None]
+    if entries:
+        entries.sort(key=lambda entry: (page_date(entry), entry["url"]), reverse=True)
+    else:
+        entries = sorted(index, key=lambda entry: entry["url"])
+    home = next((entry for entry in index if entry["url"] == basepath), None)
+    title = home["title"] if home is not None and home["title"] else site_url
+    description = (home.get("search") or {}).get("summary") if home is not None else None
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<rss version="2.0">',
+        "<channel>",
+        f"  <title>{escape(title)}</title>",
+        f"  <link>{escape(absolute_url(site_url, basepath))}</link>",
+        f"  <description>{escape(description or title)}</description>",
+    ]
+    for entry in entries[:FEED_ENTRIES]:
+        url = escape(absolute_url(site_url, entry["url"]))
+        lines.append("  <item>")
+        lines.append(f"    <title>{escape(entry['title'] or entry['url'])}</title>")
+        lines.append(f"    <link>{url}</link>")
+        lines.append(f"    <guid>{url}</guid>")
+        date = page_date(entry)
+        if date is not None:
+            lines.append(f"    <pubDate>{format_datetime(date)}</pubDate>")
+        summary = (entry.get("search") or {}).get("summary")
+        if summary:
+            lines.append(f"    <description>{escape(summary)}</description>")
+        lines.append("  </item>")
+    lines += ["</channel>", "</rss>"]
+    return "\n".join(lines) + "\n"
+
+
+def search_index(index, budget=SEARCH_INDEX_BUDGET):
+    # {"pages": [[url, title, summary]], "terms": {term: [page numbers]}}
+    # Postings list the pages that use a term most first. Terms go in by
+    # how much they are used across the site until the budget is spent;
+    # terms on most pages of a larger site can't narrow a search, so they
+    # are left out.
+    entries = sorted(index, key=lambda entry: entry["url"])
+    pages = []
+    weights = {}
+    for number, entry in enumerate(entries):
+        search = entry.get("search") or {}
+        pages.append([entry["url"], entry["title"] or "", search.get("summary", "")])
+        page_terms = dict(search.get("terms", {}))
+        for term in terms(entry["title"] or ""):
+            page_terms[term] = page_terms.get(term, 0) + TITLE_WEIGHT
+        for term, weight in page_terms.items():
+            weights.setdefault(term, []).append((weight, number))
+    size = len(json.dumps({"pages": pages, "terms": {}}, ensure_ascii=False, separators=(",", ":")).encode())
+    chosen = {}
+    ranked = sorted(weights.items(), key=lambda item: (-sum(weight for weight, _ in item[1]), item[0]))
+    for term, postings in ranked:
+        if len(entries) >= 4 and len(postings) > len(entries) // 2:
+            continue
+        numbers = [number for weight, number in sorted(postings, key=lambda posting: (-posting[0], posting[1]))]
+        # "term":[1,2],
+        cost = len(term.encode()) + 5 + sum(len(str(number)) + 1 for number in numbers)
+        if size + cost > budget:
+            continue
+        size += cost
+        chosen[term] = numbers
+    return {"pages": pages, "terms": {term: chosen[term] for term in sorted(chosen)}}
+
+
+def search_index_json(index, budget=SEARCH_INDEX_BUDGET):
+    return json.dumps(search_index(index, budget), ensure_ascii=False, separators=(",", ":"))
+
+
+def write_site_files(index, dest_dir, basepath="/", site_url=None, search=False, manifest=None):
+    # Writes the enabled files and removes disabled ones, so turning one off
+    # leaves no stale copy. A static asset of the same name wins: it is never
+    # overwritten or removed. Returns the names written.
+    files = {
+        SITEMAP_NAME: sitemap_xml(index, site_url) if site_url else None,
+        FEED_NAME: feed_xml(index, site_url, basepath) if site_url else None,
+        SEARCH_INDEX_NAME: search_index_json(index) if search else None,
+    }
+    static = manifest.assets if manifest is not None else {}
+    writer = OutputWriter(0)
+    written = []
+    for name, data in files.items():
+        path = os.path.join(dest_dir, name)
+        if name in static:
+            continue
+        if data is not None:
+            writer.write(path, data.encode())
+            written.append(name)
+        elif os.path.exists(path):
+            os.remove(path)
+    return written
@@ -0,0 +1,40 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from build import generate_pages_recursive
+
+
+class SiteTestCase(unittest.TestCase):
+    # A site in a temporary directory: pages go under self.content, the
+    # template is self.template and builds write to self.docs.
+    TEMPLATE = "<title>{{ Title }}</title>{{ Content }}"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.docs = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        self.write(self.template, self.TEMPLATE)
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(data)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def build(self, manifest=None, dest=None, basepath="/", **kwargs):
+        # Builds the site without printing; what the build printed is left
+        # in self.output.
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            index = generate_pages_recursive(self.content, self.template, dest or self.docs, basepath, manifest, **kwargs)
+        self.output = out.getvalue()
+        return index
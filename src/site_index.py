@@ -0,0 +1,44 @@
+import os
+
+# The site index holds what every page says about itself (title, URL and
+# front matter). It is built before any page is rendered, so templates can
+# use it: headers of unchanged pages come from the build manifest, and pages
+# about to be rebuilt are read only up to their title. Listings and feeds
+# never need a parse of page bodies.
+
+
+def page_url(dest_path, dest_dir, basepath="/"):
+    rel_path = os.path.relpath(dest_path, dest_dir).replace(os.sep, "/")
+    if rel_path == "index.html":
+        rel_path = ""
+    elif rel_path.endswith("/index.html"):
+        rel_path = rel_path[: -len("index.html")]
+    return basepath + rel_path
+
+
+class SiteIndex:
+    def __init__(self):
+        self.pages = {}
+
+    def add(self, source, url, title, metadata):
+        self.pages[source] = {"source": source, "url": url, "title": title, "metadata": metadata}
+
+    def remove(self, source):
+        self.pages.pop(source, None)
+
+    def get(self, source):
+        return self.pages.get(source)
+
+    def sorted_by(self, key, reverse=False):
+        # pages that set front matter field key, ordered by it
+        entries = [entry for entry in self if key in entry["metadata"]]
+        return sorted(entries, key=lambda entry: entry["metadata"][key], reverse=reverse)
+
+    def __iter__(self):
+        return iter([self.pages[source] for source in sorted(self.pages)])
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __repr__(self):
+        return f"SiteIndex({len(self.pages)} pages)"
@@ -0,0 +1,126 @@
+import os
+import re
+
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+# {{> partials/nav.html }} pulls in another file, relative to the includer
+INCLUDE_RE = re.compile(r"\{\{>\s*([^\s}]+)\s*\}\}")
+
+_templates = {}
+
+
+STATIC_URL_RE = re.compile(r'(href|src)="(/[^"]*)"')
+
+
+def rewrite_static_urls(html, basepath, assets=None, used=None):
+    if assets is None:
+        html = html.replace('href="/', f'href="{basepath}')
+        return html.replace('src="/', f'src="{basepath}')
+
+    # fingerprinted assets get their hashed name; used collects what was seen
+    def rewrite(match):
+        url = match.group(2)
+        if used is not None:
+            used.append(url)
+        return f'{match.group(1)}="{basepath}{assets.url(url)[1:]}"'
+
+    return STATIC_URL_RE.sub(rewrite, html)
+
+
+class Template:
+    def __init__(self, statics, slots, dependencies=None, urls=None):
+        # statics has one more entry than slots: static, slot, static, ..., static
+        self.statics = statics
+        self.slots = slots
+        # every file the template was assembled from, itself first
+        self.dependencies = dependencies or []
+        # site-absolute URLs the template itself references
+        self.urls = urls or []
+
+    def render(self, values):
+        parts = [self.statics[0]]
+        for (name, raw), static in zip(self.slots, self.statics[1:]):
+            value = values.get(name)
+            # unknown placeholders are left in the page untouched
+            if value is None:
+                parts.append(raw)
+            elif isinstance(value, str):
+                parts.append(value)
+            else:
+                value.write_parts(parts.append)
+            parts.append(static)
+        return "".join(parts)
+
+    def write(self, fp, values):
+        fp.write(self.statics[0])
+        for (name, raw), static in zip(self.slots, self.statics[1:]):
+            value = values.get(name)
+            if value is None:
+                fp.write(raw)
+            elif isinstance(value, str):
+                fp.write(value)
+            else:
+                # HTML nodes are streamed straight into the output file
+                value.write_html(fp)
+            fp.write(static)
+
+    def __repr__(self):
+        return f"Template(slots: {[name for name, raw in self.slots]})"
+
+
+def compile_template(template_data, basepath="/", dependencies=None, assets=None):
+    statics = []
+    slots = []
+    urls = []
+    start = 0
+    for match in PLACEHOLDER_RE.finditer(template_data):
+        statics.append(rewrite_static_urls(template_data[start : match.start()], basepath, assets, urls))
+        slots.append((match.group(1), match.group(0)))
+        start = match.end()
+    statics.append(rewrite_static_urls(template_data[start:], basepath, assets, urls))
+    return Template(statics, slots, dependencies, urls)
+
+
+def expand_includes(template_path, including=()):
+    # Returns the template text with every include spliced in, and the list
+    # of files that went into it.
+    with open(template_path, encoding="utf-8") as t:
+        data = t.read()
+    including = including + (template_path,)
+    dependencies = [template_path]
+    parts = []
+    start = 0
+    for match in INCLUDE_RE.finditer(data):
+        include_path = os.path.normpath(os.path.join(os.path.dirname(template_path), match.group(1)))
+        if include_path in including:
+            raise ValueError(f"{template_path} includes {include_path} in a cycle")
+        text, included = expand_includes(include_path, including)
+        parts.append(data[start : match.start()])
+        parts.append(text)
+        dependencies.extend(included)
+        start = match.end()
+    parts.append(data[start:])
+    return "".join(parts), list(dict.fromkeys(dependencies))
+
+
+def file_signatures(paths):
+    signatures = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signatures.append((stat.st_mtime_ns, stat.st_size))
+    return signatures
+
+
+def load_template(template_path, basepath="/", assets=None):
+    template_path = os.path.normpath(template_path)
+    key = (os.path.abspath(template_path), basepath, assets.key if assets is not None else None)
+    cached = _templates.get(key)
+    # the cached copy is good while neither the template nor its partials moved
+    if cached is not None and cached[0] == file_signatures(cached[1].dependencies):
+        return cached[1]
+    data, dependencies = expand_includes(template_path)
+    template = compile_template(data, basepath, dependencies, assets)
+    _templates[key] = (file_signatures(dependencies), template)
+    return template
@@ -0,0 +1,126 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from assets import AssetMap, fingerprint_path, sync_tree
+from build import generate_pages_recursive
+from manifest import Manifest
+
+
+class TestSyncTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dst = os.path.join(self.tmp.name, "docs")
+        self.write(os.path.join(self.src, "index.css"), "body {}")
+        self.write(os.path.join(self.src, "images", "a.png"), "png-a")
+        self.write(os.path.join(self.src, "images", "b.png"), "png-b")
+        self.manifest = Manifest(os.path.join(self.tmp.name, "manifest.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(data)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_copies_then_skips(self):
+        counts = sync_tree(self.src, self.dst, self.manifest, link=False)
+        self.assertEqual(counts["copied"], 3)
+        self.assertEqual(self.read(os.path.join(self.dst, "images", "a.png")), "png-a")
+        counts = sync_tree(self.src, self.dst, self.manifest, link=False)
+        self.assertEqual(counts["copied"], 0)
+        self.assertEqual(counts["skipped"], 3)
+
+    def test_changed_asset_copied(self):
+        sync_tree(self.src, self.dst, self.manifest, link=False)
+        path = os.path.join(self.src, "index.css")
+        self.write(path, "body { color: red }")
+        counts = sync_tree(self.src, self.dst, self.manifest, link=False)
+        self.assertEqual(counts["copied"], 1)
+        self.assertEqual(self.read(os.path.join(self.dst, "index.css")), "body { color: red }")
+
+    def test_deleted_asset_pruned(self):
+        self.write(os.path.join(self.dst, "index.html"), "generated page")
+        sync_tree(self.src, self.dst, self.manifest, link=False)
+        os.remove(os.path.join(self.src, "images", "a.png"))
+        os.remove(os.path.join(self.src, "images", "b.png"))
+        counts = sync_tree(self.src, self.dst, self.manifest, link=False)
+        self.assertEqual(counts["removed"], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "images")))
+        # kept for the link check, which looks again at pages linking to them
+        self.assertEqual(self.manifest.removed, {os.path.join(self.dst, "images", name) for name in ["a.png", "b.png"]})
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "index.html")))
+
+    def test_hash_mode_ignores_touch(self):
+        sync_tree(self.src, self.dst, self.manifest, "hash", link=False)
+        path = os.path.join(self.src, "index.css")
+        os.utime(path, ns=(1, 1))
+        counts = sync_tree(self.src, self.dst, self.manifest, "hash", link=False)
+        self.assertEqual(counts["copied"], 0)
+        self.assertEqual(self.manifest.assets["index.css"]["mtime"], 1)
+
+    def test_link_shares_storage(self):
+        counts = sync_tree(self.src, self.dst, self.manifest, link=True)
+        self.assertEqual(counts["linked"] + counts["copied"], 3)
+        if counts["linked"]:
+            self.assertEqual(self.read(os.path.join(self.dst, "index.css")), "body {}")
+        counts = sync_tree(self.src, self.dst, self.manifest, link=True)
+        self.assertEqual(counts["skipped"], 3)
+
+    def test_copied_by_default(self):
+        counts = sync_tree(self.src, self.dst, self.manifest)
+        self.assertEqual((counts["copied"], counts["linked"]), (3, 0))
+        self.assertEqual(os.stat(os.path.join(self.dst, "index.css")).st_nlink, 1)
+
+    def test_page_over_linked_asset_leaves_source_alone(self):
+        # a page rendered to the same path as a hardlinked static file
+        source = os.path.join(self.src, "contact", "index.html")
+        self.write(source, "static contact page")
+        sync_tree(self.src, self.dst, self.manifest, link=True)
+        content = os.path.join(self.tmp.name, "content")
+        template = os.path.join(self.tmp.name, "template.html")
+        self.write(os.path.join(content, "contact", "index.md"), "# Contact\n\nrendered")
+        self.write(template, "{{ Content }}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(content, template, self.dst, "/", self.manifest)
+        self.assertEqual(self.read(source), "static contact page")
+        self.assertIn("rendered", self.read(os.path.join(self.dst, "contact", "index.html")))
+
+    def test_fingerprint_names(self):
+        self.assertEqual(fingerprint_path(os.path.join("css", "site.css"), "0123456789abcdef"),
+                         os.path.join("css", "site.0123456789ab.css"))
+        self.assertEqual(fingerprint_path("favicon.ico", "0123456789abcdef"), "favicon.ico")
+
+    def test_fingerprinted_sync(self):
+        sync_tree(self.src, self.dst, self.manifest, link=False, fingerprint=True)
+        output = self.manifest.assets["index.css"]["output"]
+        self.assertTrue(output.startswith("index.") and output.endswith(".css"))
+        self.assertEqual(self.read(os.path.join(self.dst, output)), "body {}")
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "index.css")))
+        assets = AssetMap(self.src, self.manifest.assets)
+        self.assertEqual(assets.url("/index.css?v=2#top"), f"/{output}?v=2#top")
+        self.assertEqual(assets.url("/missing.css"), "/missing.css")
+        self.assertEqual(assets.deps(["/index.css", "/x"]), {
+            os.path.join(self.src, "index.css"): self.manifest.assets["index.css"]["hash"]
+        })
+        # a new fingerprint replaces the old file
+        self.write(os.path.join(self.src, "index.css"), "body { color: red }")
+        sync_tree(self.src, self.dst, self.manifest, link=False, fingerprint=True)
+        self.assertNotEqual(self.manifest.assets["index.css"]["output"], output)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, output)))
+        self.assertNotEqual(AssetMap(self.src, self.manifest.assets).key, assets.key)
+        # and turning fingerprinting off goes back to plain names
+        sync_tree(self.src, self.dst, self.manifest, link=False)
+        self.assertEqual(sorted(os.listdir(self.dst)), ["images", "index.css"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from bench_corpus import generate_corpus, page_path, parse_mix
+from markdown_blocks import extract_title, markdown_to_html_node
+
+
+class TestBenchCorpus(unittest.TestCase):
+    def test_parse_mix(self):
+        mix = parse_mix("code=5,quote=0")
+        self.assertEqual(mix["code"], 5)
+        self.assertEqual(mix["quote"], 0)
+        self.assertEqual(mix["paragraph"], parse_mix("")["paragraph"])
+        with self.assertRaises(ValueError):
+            parse_mix("table=1")
+
+    def test_page_path_depth(self):
+        path = page_path("root", 10, 2, 4)
+        self.assertEqual(path, os.path.join("root", "section2", "section2", "page10.md"))
+
+    def test_generated_pages_parse(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_corpus(tmp, pages=12, depth=1, fanout=3, seed=4, blocks=30)
+            found = []
+            for dirpath, dirs, files in os.walk(tmp):
+                for name in files:
+                    with open(os.path.join(dirpath, name)) as f:
+                        text = f.read()
+                    markdown_to_html_node(text).to_html()
+                    found.append(extract_title(text))
+            self.assertEqual(sorted(found), sorted(f"Page {i}" for i in range(12)))
+
+    def test_deterministic(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            generate_corpus(a, pages=3, seed=9)
+            generate_corpus(b, pages=3, seed=9)
+            for i in range(3):
+                with open(page_path(a, i, 2, 8)) as fa, open(page_path(b, i, 2, 8)) as fb:
+                    self.assertEqual(fa.read(), fb.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import MIN_SIZE, precompress_tree, remove_precompressed
+from manifest import Manifest
+
+PAGE = "<p>" + "hello world " * 100 + "</p>"
+
+
+class TestPrecompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.write("index.html", PAGE)
+        self.write(os.path.join("blog", "index.html"), PAGE)
+        self.write("tiny.css", "a {}")
+        self.write("photo.png", "x" * 1000)
+        self.manifest = Manifest()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, data):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(data)
+
+    def exists(self, rel_path):
+        return os.path.exists(os.path.join(self.root, rel_path))
+
+    def test_text_outputs_only(self):
+        counts = precompress_tree(self.root, self.manifest)
+        self.assertEqual(counts["compressed"], 2)
+        with gzip.open(os.path.join(self.root, "index.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), PAGE)
+        self.assertTrue(self.exists(os.path.join("blog", "index.html.gz")))
+        self.assertFalse(self.exists("tiny.css.gz"))
+        self.assertFalse(self.exists("photo.png.gz"))
+        self.assertLess(counts[".gz"], counts["bytes"])
+
+    def test_unchanged_skipped(self):
+        precompress_tree(self.root, self.manifest)
+        counts = precompress_tree(self.root, self.manifest)
+        self.assertEqual((counts["compressed"], counts["skipped"]), (0, 2))
+        self.write("index.html", PAGE + "<p>more</p>")
+        os.utime(os.path.join(self.root, "index.html"), ns=(0, 10**18))
+        counts = precompress_tree(self.root, self.manifest)
+        self.assertEqual((counts["compressed"], counts["skipped"]), (1, 1))
+        with gzip.open(os.path.join(self.root, "index.html.gz"), "rt") as f:
+            self.assertTrue(f.read().endswith("<p>more</p>"))
+
+    def test_stale_siblings_removed(self):
+        precompress_tree(self.root, self.manifest)
+        os.remove(os.path.join(self.root, "blog", "index.html"))
+        self.write("index.html", "x" * (MIN_SIZE - 1))
+        counts = precompress_tree(self.root, self.manifest)
+        self.assertEqual(counts["removed"], 2)
+        self.assertFalse(self.exists("index.html.gz"))
+        self.assertFalse(self.exists(os.path.join("blog", "index.html.gz")))
+
+    def test_turning_off(self):
+        precompress_tree(self.root, self.manifest)
+        self.write("archive.json.gz", "not ours")
+        self.assertEqual(remove_precompressed(self.root, self.manifest), 2)
+        self.assertFalse(self.exists("index.html.gz"))
+        self.assertTrue(self.exists("archive.json.gz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
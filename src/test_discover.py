@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from discover import IGNORE_PATTERNS, is_ignored, walk_files
+from manifest import Manifest
+from site_fixture import SiteTestCase
+
+
+class TestWalkFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        for rel_path in ["b.md", "a.md", "z/c.md", "y/d.md", "y/x/e.md", "y/notes.txt", "y/.d.md.swp", "drafts/f.md"]:
+            self.write(rel_path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(rel_path)
+
+    def rel_paths(self, *args, **kwargs):
+        return [entry.rel_path.replace(os.sep, "/") for entry in walk_files(self.root, *args, **kwargs)]
+
+    def test_same_order_as_sorted_walk(self):
+        expected = []
+        for dirpath, dirs, files in os.walk(self.root):
+            dirs.sort()
+            for name in sorted(files):
+                expected.append(os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/"))
+        self.assertEqual(self.rel_paths(ignore=None), expected)
+
+    def test_suffix_and_ignore(self):
+        self.assertEqual(self.rel_paths(".md", IGNORE_PATTERNS + ("drafts", "y/x/*")), ["a.md", "b.md", "y/d.md", "z/c.md"])
+
+    def test_ignored_directories_are_not_listed(self):
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            self.rel_paths(ignore=("drafts", "y"))
+        listed = sorted(os.path.relpath(call.args[0], self.root) for call in scandir.call_args_list)
+        self.assertEqual(listed, [".", "z"])
+
+    def test_lazy(self):
+        walk = walk_files(self.root)
+        with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+            self.assertEqual(next(walk).rel_path, "a.md")
+            self.assertEqual(scandir.call_count, 1)
+
+    def test_stat_from_listing(self):
+        entry = next(walk_files(self.root))
+        self.assertEqual(entry.stat().st_size, os.path.getsize(entry.path))
+
+    def test_is_ignored(self):
+        self.assertTrue(is_ignored(os.path.join("blog", "post.md~"), IGNORE_PATTERNS))
+        self.assertTrue(is_ignored("drafts/post.md", ["drafts/*"]))
+        self.assertFalse(is_ignored("blog/drafts.md", ["drafts"]))
+
+
+class TestStatCachedDiscovery(SiteTestCase):
+    TEMPLATE = "{{ Content }}"
+
+    def setUp(self):
+        super().setUp()
+        self.page = os.path.join(self.content, "index.md")
+        self.write(self.page, "# Home\n\nhello")
+        self.manifest = Manifest()
+
+    def opened_by_build(self):
+        # the paths the build opened
+        with mock.patch("builtins.open", wraps=open) as opened:
+            index = self.build(self.manifest)
+        self.assertEqual(index.get(self.page)["title"], "Home")
+        return [str(call.args[0]) for call in opened.call_args_list]
+
+    def test_unchanged_pages_are_not_read(self):
+        self.assertIn(self.page, self.opened_by_build())
+        self.assertEqual([path for path in self.opened_by_build() if path.endswith(".md")], [])
+        # a touched page is hashed again, but its header still comes from
+        # the manifest while the hash matches
+        stat = os.stat(self.page)
+        os.utime(self.page, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        self.assertEqual(self.opened_by_build().count(self.page), 1)
+        self.assertEqual([path for path in self.opened_by_build() if path.endswith(".md")], [])
+
+    def test_ignored_pages(self):
+        self.write(os.path.join(self.content, "#index.md#"), "not a page")
+        self.write(os.path.join(self.content, "draft.md"), "no title yet")
+        self.build(self.manifest, ignore=IGNORE_PATTERNS + ("draft.md",))
+        self.assertEqual(os.listdir(self.docs), ["index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import unittest
+from unittest import mock
+
+import build
+from frontmatter import parse_front_matter, split_front_matter
+from manifest import Manifest
+from markdown_blocks import markdown_to_document
+from site_fixture import SiteTestCase
+from site_index import page_url
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_split(self):
+        metadata, body = split_front_matter(
+            "---\ntitle: \"Tom\"\ndate: 2024-05-01\ntags: [a, 'b c']\n---\n# Heading\n\ntext"
+        )
+        self.assertEqual(metadata, {"title": "Tom", "date": "2024-05-01", "tags": ["a", "b c"]})
+        self.assertEqual(body, "# Heading\n\ntext")
+
+    def test_no_front_matter(self):
+        self.assertEqual(split_front_matter("# Heading"), ({}, "# Heading"))
+        # a leading horizontal rule is left alone
+        text = "---\nnot a field\n\n# Heading"
+        self.assertEqual(split_front_matter(text), ({}, text))
+        self.assertEqual(split_front_matter("---\na: b"), ({}, "---\na: b"))
+
+    def test_scan_stops_at_fence(self):
+        lines = iter(["---\n", "a: 1\n", "---\n", "body\n", "more\n"])
+        metadata, rest = parse_front_matter(lines)
+        self.assertEqual(metadata, {"a": "1"})
+        self.assertEqual(next(lines), "body\n")
+
+    def test_document_title(self):
+        document = markdown_to_document("---\ntitle: Override\n---\n# Heading\n\ntext")
+        self.assertEqual(document.title, "Override")
+        self.assertEqual(document.headings, [(1, "Heading")])
+        self.assertEqual(document.node.to_html(), "<div><h1>Heading</h1><p>text</p></div>")
+
+    def test_page_url(self):
+        self.assertEqual(page_url("docs/index.html", "docs", "/base/"), "/base/")
+        self.assertEqual(page_url("docs/blog/tom/index.html", "docs"), "/blog/tom/")
+        self.assertEqual(page_url("docs/about.html", "docs"), "/about.html")
+
+
+class TestSiteIndex(SiteTestCase):
+    TEMPLATE = "<title>{{ Title }}</title><i>{{ date }}</i>{{ Content }}"
+
+    def setUp(self):
+        super().setUp()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(
+            os.path.join(self.content, "blog", "one.md"),
+            "---\ntitle: First\ndate: 2024-01-01\n---\n# Post one\n\ntext",
+        )
+        self.write(
+            os.path.join(self.content, "blog", "two.md"),
+            "---\ndate: 2024-02-01\n---\n# Post two\n\ntext",
+        )
+
+    def test_index_before_render(self):
+        index = self.build(basepath="/site/")
+        self.assertEqual(len(index), 3)
+        posts = index.sorted_by("date", reverse=True)
+        self.assertEqual([(post["title"], post["url"]) for post in posts], [
+            ("Post two", "/site/blog/two.html"),
+            ("First", "/site/blog/one.html"),
+        ])
+        self.assertEqual(index.get(os.path.join(self.content, "index.md"))["url"], "/site/")
+        self.assertEqual(
+            self.read(os.path.join(self.docs, "blog", "one.html")),
+            "<title>First</title><i>2024-01-01</i><div><h1>Post one</h1><p>text</p></div>",
+        )
+
+    def test_index_kept_with_manifest(self):
+        path = os.path.join(self.root, "manifest.json")
+        manifest = Manifest(path)
+        first = self.build(manifest)
+        manifest.save()
+        # nothing is rebuilt, yet the reloaded manifest indexes every page
+        index = self.build(Manifest.load(path))
+        self.assertEqual(self.output, "")
+        self.assertEqual(list(index), list(first))
+        self.assertEqual(index.get(os.path.join(self.content, "blog", "one.md"))["metadata"]["date"], "2024-01-01")
+
+    def test_only_rebuilt_pages_scanned(self):
+        manifest = Manifest()
+        two = os.path.join(self.content, "blog", "two.md")
+        self.build(manifest)
+        self.write(two, "---\ndate: 2024-02-01\n---\n# Renamed\n\ntext")
+        with mock.patch.object(build, "scan_page", wraps=build.scan_page) as scan_page:
+            index = self.build(manifest)
+        # the other pages' headers come from the manifest
+        scan_page.assert_called_once_with(two)
+        self.assertEqual([entry["title"] for entry in index], ["First", "Renamed", "Home"])
+
+    def test_templates_see_the_index(self):
+        self.write(self.template, '<link rel="canonical" href="{{ Url }}">{{ Title }}')
+        for jobs in [1, 2]:
+            self.build(basepath="/site/", jobs=jobs)
+            self.assertEqual(
+                self.read(os.path.join(self.docs, "blog", "two.html")),
+                '<link rel="canonical" href="/site/blog/two.html">Post two',
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
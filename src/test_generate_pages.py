@@ -0,0 +1,93 @@
+import os
+import unittest
+from unittest import mock
+
+import build
+from site_fixture import SiteTestCase
+
+
+class TestGeneratePages(SiteTestCase):
+    TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+    def setUp(self):
+        super().setUp()
+        for i in range(6):
+            self.write(
+                os.path.join(self.content, f"section{i % 2}", f"page{i}.md"),
+                f"# Page {i}\n\nSome **bold** text and a [link](/page{i}).",
+            )
+
+    def build_to(self, dest, jobs):
+        self.build(dest=dest, basepath="/base/", jobs=jobs)
+        return self.output
+
+    def read_tree(self, root):
+        files = {}
+        for dirpath, dirs, names in os.walk(root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                with open(path) as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_parallel_matches_serial(self):
+        serial_dest = os.path.join(self.root, "serial")
+        parallel_dest = os.path.join(self.root, "parallel")
+        serial_log = self.build_to(serial_dest, 1)
+        parallel_log = self.build_to(parallel_dest, 3)
+        self.assertEqual(self.read_tree(serial_dest), self.read_tree(parallel_dest))
+        self.assertEqual(
+            serial_log.replace(serial_dest, "DEST"),
+            parallel_log.replace(parallel_dest, "DEST"),
+        )
+        self.assertIn(
+            '<a href="/base/page3">link</a>',
+            self.read_tree(parallel_dest)[os.path.join("section1", "page3.html")],
+        )
+
+    def test_parallel_error_names_first_failing_page(self):
+        self.write(os.path.join(self.content, "section0", "page2.md"), "no title")
+        self.write(os.path.join(self.content, "section1", "page5.md"), "no title")
+        with self.assertRaises(Exception) as cm:
+            self.build_to(os.path.join(self.root, "out"), 3)
+        self.assertIn(os.path.join("section0", "page2.md"), str(cm.exception))
+
+    def test_streamed_pages_match(self):
+        self.write(
+            os.path.join(self.content, "section0", "page0.md"),
+            "---\ntitle: From front matter\n---\n# Page 0\n\ntext",
+        )
+        in_memory = os.path.join(self.root, "in_memory")
+        streamed = os.path.join(self.root, "streamed")
+        self.build_to(in_memory, 1)
+        threshold = build.STREAM_THRESHOLD
+        build.STREAM_THRESHOLD = 0
+        try:
+            self.build_to(streamed, 1)
+        finally:
+            build.STREAM_THRESHOLD = threshold
+        self.assertEqual(self.read_tree(in_memory), self.read_tree(streamed))
+        self.assertEqual(
+            self.read_tree(streamed)[os.path.join("section0", "page0.html")],
+            "<title>From front matter</title><body><div><h1>Page 0</h1><p>text</p></div></body>",
+        )
+
+    def test_utf8_on_every_path(self):
+        # mapped, "\r" text-read and streamed pages all decode and encode alike
+        pages = {"page0.md": "# Café\n\nnaïve 日本", "page2.md": "# Café\r\n\r\nnaïve 日本"}
+        for name, data in pages.items():
+            with open(os.path.join(self.content, "section0", name), "wb") as f:
+                f.write(data.encode("utf-8"))
+        outputs = []
+        for dest, threshold in [("in_memory", build.STREAM_THRESHOLD), ("streamed", 0)]:
+            with mock.patch.object(build, "STREAM_THRESHOLD", threshold):
+                self.build_to(os.path.join(self.root, dest), 1)
+            for name in ["page0.html", "page2.html"]:
+                with open(os.path.join(self.root, dest, "section0", name), "rb") as f:
+                    outputs.append(f.read())
+        self.assertEqual(len(set(outputs)), 1)
+        self.assertIn("<h1>Café</h1><p>naïve 日本</p>".encode("utf-8"), outputs[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import highlight
+import parse_cache
+from highlight import code_language
+from markdown_blocks import markdown_to_html_node
+
+
+CODE = "```python\ndef f(x):\n    return x < 1\n```"
+
+
+class TestCodeLanguage(unittest.TestCase):
+    def test_code_language(self):
+        self.assertEqual(code_language("Python"), "python")
+        self.assertEqual(code_language(" c++ {linenos}"), "c++")
+        self.assertIsNone(code_language(""))
+        self.assertIsNone(code_language('"><script>'))
+
+
+@unittest.skipIf(highlight.pygments is None, "highlighting needs Pygments")
+class TestHighlight(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "highlight.sqlite")
+
+    def tearDown(self):
+        highlight.disable()
+        parse_cache.disable()
+        self.tmp.cleanup()
+
+    def test_highlighted(self):
+        highlight.configure(self.path)
+        html = markdown_to_html_node(CODE).to_html()
+        self.assertTrue(html.startswith('<div><pre class="highlight"><code class="language-python"><span class="k">def</span>'))
+        self.assertIn('<span class="o">&lt;</span>', html)
+
+    def test_unknown_language_is_left_alone(self):
+        highlight.configure(self.path)
+        html = markdown_to_html_node("```nosuchlang\nx\n```").to_html()
+        self.assertEqual(html, '<div><pre><code class="language-nosuchlang">x\n</code></pre></div>')
+
+    def test_cached_across_builds(self):
+        highlighter = highlight.configure(self.path)
+        expected = markdown_to_html_node(CODE).to_html()
+        highlighter.flush()
+        self.assertEqual((highlighter.cache.hits, highlighter.cache.misses), (0, 1))
+        highlight.disable()
+        highlighter = highlight.configure(self.path)
+        with mock.patch("pygments.highlight", wraps=highlight.pygments.highlight) as pygments_highlight:
+            self.assertEqual(markdown_to_html_node(CODE).to_html(), expected)
+            # the same snippet under another language is another entry
+            markdown_to_html_node(CODE.replace("python", "ruby"))
+        self.assertEqual(pygments_highlight.call_count, 1)
+        self.assertEqual((highlighter.cache.hits, highlighter.cache.misses), (1, 1))
+
+    def test_parse_cache_keys(self):
+        parse_cache.configure(os.path.join(self.tmp.name, "parse-cache.sqlite"))
+        plain = markdown_to_html_node(CODE).to_html()
+        highlight.configure(self.path)
+        self.assertNotEqual(markdown_to_html_node(CODE).to_html(), plain)
+        highlight.disable()
+        self.assertEqual(markdown_to_html_node(CODE).to_html(), plain)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 from htmlnode import LeafNode, ParentNode, HTMLNode
 
@@ -108,6 +109,48 @@ class TestHTMLNode(unittest.TestCase):
             "<h2><b>Bold text</b>Normal text<i>italic text</i>Normal text</h2>",
         )
 
+    def test_not_implemented(self):
+        node = HTMLNode("p", "text")
+        with self.assertRaises(NotImplementedError):
+            node.to_html()
+
+    def test_write_html(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode("a", "link", {"href": "/x", "class": "c"})]),
+                LeafNode(None, "tail"),
+            ],
+            {"id": "main"},
+        )
+        out = io.StringIO()
+        node.write_html(out)
+        self.assertEqual(
+            out.getvalue(),
+            '<div id="main"><p><a href="/x" class="c">link</a></p>tail</div>',
+        )
+        self.assertEqual(out.getvalue(), node.to_html())
+
+    def test_to_html_wide_tree(self):
+        items = [ParentNode("li", [LeafNode("b", str(i))]) for i in range(5000)]
+        html = ParentNode("ul", items).to_html()
+        self.assertTrue(html.startswith("<ul><li><b>0</b></li>"))
+        self.assertTrue(html.endswith("<li><b>4999</b></li></ul>"))
+        self.assertEqual(html.count("<li>"), 5000)
+
+    def test_compact_nodes(self):
+        leaf = LeafNode("b", "bold")
+        parent = ParentNode("p", [leaf])
+        self.assertFalse(hasattr(leaf, "__dict__"))
+        self.assertFalse(hasattr(parent, "__dict__"))
+        self.assertIsNone(leaf.children)
+        self.assertIsNone(parent.value)
+        self.assertEqual(repr(leaf), "LeafNode(b, bold, None)")
+        # the fields stay writable, as on the base class
+        leaf.children = []
+        parent.value = "text"
+        self.assertEqual((leaf.children, parent.value), ([], "text"))
+
 
 if __name__ == "__main__":
     unittest.main()
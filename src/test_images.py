@@ -0,0 +1,111 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+from assets import AssetMap, sync_tree
+from images import Image, ImageCache, image_size, png_chunk, png_chunks, recompress_png, variant_path
+from links import LinkResolver
+from manifest import Manifest
+from textnode import TextNode, TextType, text_node_to_html_node
+
+
+def make_png(width, height, extra_chunks=()):
+    # a grey gradient, deflated at level 0 so there is something to recompress
+    rows = b"".join(b"\x00" + bytes((x + y) % 256 for x in range(width)) for y in range(height))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    chunks = [png_chunk(b"IHDR", ihdr)]
+    chunks.extend(png_chunk(kind, body) for kind, body in extra_chunks)
+    chunks.append(png_chunk(b"IDAT", zlib.compress(rows, 0)))
+    chunks.append(png_chunk(b"IEND", b""))
+    return b"\x89PNG\r\n\x1a\n" + b"".join(chunks)
+
+
+def pixels(data):
+    return zlib.decompress(b"".join(body for kind, body in png_chunks(data) if kind == b"IDAT"))
+
+
+class TestImageSize(unittest.TestCase):
+    def test_png(self):
+        self.assertEqual(image_size(make_png(30, 20)), (30, 20))
+
+    def test_gif(self):
+        self.assertEqual(image_size(b"GIF89a" + struct.pack("<HH", 640, 480) + b"\x00" * 8), (640, 480))
+
+    def test_jpeg(self):
+        app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+        sof = b"\xff\xc0" + struct.pack(">HBHH", 11, 8, 600, 800) + b"\x01\x01\x11\x00"
+        self.assertEqual(image_size(b"\xff\xd8" + app0 + sof + b"\xff\xd9"), (800, 600))
+
+    def test_unknown(self):
+        self.assertIsNone(image_size(b"not an image"))
+
+
+class TestRecompressPng(unittest.TestCase):
+    def test_lossless(self):
+        data = make_png(64, 64, [(b"tEXt", b"Comment\x00hello"), (b"gAMA", struct.pack(">I", 45455))])
+        optimized = recompress_png(data)
+        self.assertLess(len(optimized), len(data))
+        self.assertEqual(pixels(optimized), pixels(data))
+        kinds = [kind for kind, body in png_chunks(optimized)]
+        self.assertEqual(kinds, [b"IHDR", b"gAMA", b"IDAT", b"IEND"])
+
+    def test_nothing_to_gain(self):
+        self.assertIsNone(recompress_png(recompress_png(make_png(64, 64))))
+        self.assertIsNone(recompress_png(b"GIF89a"))
+
+
+class TestImageStage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dst = os.path.join(self.tmp.name, "docs")
+        os.makedirs(os.path.join(self.src, "images"))
+        with open(os.path.join(self.src, "images", "a.png"), "wb") as f:
+            f.write(make_png(1000, 10))
+        self.manifest = Manifest(os.path.join(self.tmp.name, "manifest.json"))
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self):
+        images = ImageCache(self.cache_dir)
+        sync_tree(self.src, self.dst, self.manifest, link=False, images=images)
+        return images
+
+    def test_cached_between_builds(self):
+        self.assertEqual(self.sync().processed, 1)
+        self.assertEqual(self.sync().processed, 0)
+        entry = self.manifest.assets[os.path.join("images", "a.png")]
+        self.assertEqual((entry["image"]["width"], entry["image"]["height"]), (1000, 10))
+        with open(os.path.join(self.dst, "images", "a.png"), "rb") as f:
+            self.assertEqual(image_size(f.read()), (1000, 10))
+
+    def test_img_tag_sized(self):
+        self.sync()
+        resolver = LinkResolver("/blog/", assets=AssetMap(self.src, self.manifest.assets))
+        node = text_node_to_html_node(TextNode("a", TextType.IMAGE, "/images/a.png"), resolver)
+        self.assertEqual(node.props["width"], "1000")
+        self.assertEqual(node.props["height"], "10")
+        self.assertEqual(node.props["src"], "/blog/images/a.png")
+
+    @unittest.skipIf(Image is None, "variants need Pillow")
+    def test_variants(self):
+        self.sync()
+        variant = variant_path(os.path.join("images", "a.png"), 480)
+        self.assertTrue(os.path.exists(os.path.join(self.dst, variant)))
+        props = AssetMap(self.src, self.manifest.assets).image_props("/images/a.png")
+        self.assertIn("/images/a.480w.png 480w", props["srcset"])
+
+    def test_turning_images_off(self):
+        self.sync()
+        sync_tree(self.src, self.dst, self.manifest, link=False)
+        self.assertNotIn("image", self.manifest.assets[os.path.join("images", "a.png")])
+        with open(os.path.join(self.dst, "images", "a.png"), "rb") as f:
+            self.assertEqual(f.read(), make_png(1000, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ from inline_markdown import (
     split_nodes_image,
     split_nodes_link,
     text_to_textnodes,
+    tokenize_inline,
     extract_markdown_links,
     extract_markdown_images,
 )
@@ -191,6 +192,47 @@ class TestInlineMarkdown(unittest.TestCase):
             nodes,
         )
 
+    def test_text_to_textnodes_matches_split_passes(self):
+        samples = [
+            "plain prose with no markup at all",
+            "**bold [not a link](x)** then [a link](/y)",
+            "_italic `literal` inside_ and `code`",
+            "![a](b)[c](d)![[e](f)",
+            "a____b **** c",
+            "[a_b_c](u) and ***x***",
+            "[x ![i](u) y](v) and [w](z)",
+            "**a** [b](c)![d](e) _f_[g](h)",
+            "",
+        ]
+        for text in samples:
+            nodes = [TextNode(text, TextType.TEXT)]
+            nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+            nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+            nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+            nodes = split_nodes_image(nodes)
+            nodes = split_nodes_link(nodes)
+            self.assertListEqual(nodes, text_to_textnodes(text), text)
+
+    def test_text_to_textnodes_plain_fast_path(self):
+        for text in ["plain prose", "wow! (really) a * b", "see ](x) and ![", " ", ""]:
+            self.assertListEqual(text_to_textnodes(text), tokenize_inline(text), text)
+        self.assertListEqual(
+            text_to_textnodes("just words"), [TextNode("just words", TextType.TEXT)]
+        )
+
+    def test_text_to_textnodes_unclosed(self):
+        for text in ["an **unclosed bold", "_a **b** c_", "`code_with_underscores`"]:
+            with self.assertRaises(ValueError):
+                text_to_textnodes(text)
+
+    def test_text_to_textnodes_many_links(self):
+        text = " and ".join(f"[link {i}](https://example.com/{i})" for i in range(500))
+        nodes = text_to_textnodes(text)
+        self.assertEqual(len(nodes), 999)
+        self.assertEqual(
+            nodes[-1], TextNode("link 499", TextType.LINK, "https://example.com/499")
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,101 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import instrument
+import parse_cache
+from instrument import BuildStats, NullStats, count_nodes
+from htmlnode import LeafNode, ParentNode
+from build import generate_pages_recursive
+from markdown_blocks import markdown_to_document
+
+
+class TestInstrument(unittest.TestCase):
+    def tearDown(self):
+        instrument.disable()
+
+    def test_null_stats(self):
+        stats = NullStats()
+        with stats.timer("anything"):
+            pass
+        items = [1, 2]
+        self.assertIs(stats.iterate("x", items), items)
+        out = io.StringIO()
+        self.assertIs(stats.writer(out), out)
+        self.assertFalse(stats.enabled)
+
+    def test_timers_and_counters(self):
+        stats = BuildStats()
+        with stats.timer("parse"):
+            pass
+        stats.count("nodes", 3)
+        stats.count("nodes")
+        self.assertEqual(list(stats.iterate("split", iter([1, 2, 3]))), [1, 2, 3])
+        self.assertIn("parse", stats.timers)
+        self.assertIn("split", stats.timers)
+        self.assertEqual(stats.counters["nodes"], 4)
+
+    def test_merge_and_slowest(self):
+        stats = BuildStats()
+        stats.page("a.md", 0.5, 10)
+        other = BuildStats()
+        other.page("b.md", 2.0, 20)
+        other.add_time("write", 1.0)
+        stats.merge(other.snapshot())
+        summary = stats.summary(slowest=1)
+        self.assertEqual(summary["counters"]["pages"], 2)
+        self.assertEqual(summary["counters"]["bytes_written"], 30)
+        self.assertEqual(summary["timers"]["write"], 1.0)
+        self.assertEqual([page["source"] for page in summary["slowest_pages"]], ["b.md"])
+
+    def test_count_nodes(self):
+        node = ParentNode("div", [ParentNode("p", [LeafNode(None, "a"), LeafNode("b", "c")])])
+        self.assertEqual(count_nodes(node), 4)
+
+    def test_html_nodes_counted_where_built(self):
+        # h1 + text, p + three inline nodes, ul + two li with their text
+        page = "# Home\n\nSome **bold** text\n\n- a\n- b"
+        stats = instrument.enable()
+        markdown_to_document(page)
+        self.assertEqual(stats.counters["html_nodes"], 11)
+        with tempfile.TemporaryDirectory() as tmp:
+            parse_cache.configure(os.path.join(tmp, "parse-cache.sqlite"))
+            try:
+                markdown_to_document(page)
+                self.assertEqual(stats.counters["html_nodes"], 22)
+                # cached blocks aren't built again
+                markdown_to_document(page)
+                self.assertEqual(stats.counters["html_nodes"], 22)
+            finally:
+                parse_cache.disable()
+
+    def test_profiled_build(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            os.makedirs(content)
+            with open(os.path.join(content, "index.md"), "w") as f:
+                f.write("# Home\n\nSome **bold** text\n\n- a\n- b")
+            template = os.path.join(tmp, "template.html")
+            with open(template, "w") as f:
+                f.write("<title>{{ Title }}</title>{{ Content }}")
+            stats = instrument.enable()
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                generate_pages_recursive(content, template, os.path.join(tmp, "docs"), "/", log=False)
+            self.assertEqual(out.getvalue(), "")
+            self.assertEqual(stats.counters["pages"], 1)
+            self.assertEqual(
+                stats.counters["bytes_written"],
+                os.path.getsize(os.path.join(tmp, "docs", "index.html")),
+            )
+            for name in ["read", "block_split", "block_type", "inline_parse", "serialize", "write", "template"]:
+                self.assertIn(name, stats.timers)
+            path = os.path.join(tmp, "profile.json")
+            stats.write_json(path)
+            self.assertTrue(os.path.getsize(path) > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import os
+import unittest
+from unittest import mock
+
+import link_check
+from assets import AssetMap, sync_tree
+from manifest import Manifest, file_hash
+from site_fixture import SiteTestCase
+
+
+class TestManifest(SiteTestCase):
+    TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+    def setUp(self):
+        super().setUp()
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nworld")
+
+    def build_saved(self, basepath="/"):
+        # a build that picks up where the last saved one left off
+        manifest = Manifest.load(self.manifest_path)
+        self.build(manifest, basepath=basepath)
+        manifest.save()
+        return manifest
+
+    def broken_links(self):
+        return [line for line in self.output.splitlines() if line.startswith("Broken link")]
+
+    def test_file_hash(self):
+        path = os.path.join(self.content, "index.md")
+        self.assertEqual(file_hash(path), file_hash(path))
+        self.write(path, "# Home\n\nchanged")
+        self.assertNotEqual(file_hash(path), file_hash(self.template))
+
+    def test_round_trip(self):
+        manifest = self.build_saved()
+        loaded = Manifest.load(self.manifest_path)
+        self.assertEqual(loaded.pages, manifest.pages)
+        self.assertEqual(loaded.inputs, manifest.inputs)
+        self.assertEqual(len(loaded.pages), 2)
+
+    def test_load_missing(self):
+        manifest = Manifest.load(os.path.join(self.root, "nope.json"))
+        self.assertEqual(manifest.pages, {})
+
+    def test_unchanged_pages_skipped(self):
+        self.build_saved()
+        post = os.path.join(self.docs, "blog", "post.html")
+        self.write(post, "untouched")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nedited")
+        self.build_saved()
+        self.assertEqual(self.read(post), "untouched")
+        self.assertIn("edited", self.read(os.path.join(self.docs, "index.html")))
+
+    def test_template_change_rebuilds_all(self):
+        self.build_saved()
+        post = os.path.join(self.docs, "blog", "post.html")
+        self.write(post, "untouched")
+        self.write(self.template, self.TEMPLATE + "<!-- v2 -->")
+        self.build_saved()
+        self.assertIn("v2", self.read(post))
+
+    def test_basepath_change_rebuilds_all(self):
+        self.build_saved()
+        post = os.path.join(self.docs, "blog", "post.html")
+        self.write(post, "untouched")
+        self.build_saved("/site/")
+        self.assertNotEqual(self.read(post), "untouched")
+
+    def test_partial_change_rebuilds_dependents(self):
+        self.write(self.template, "{{> partials/head.html }}{{ Content }}")
+        self.write(os.path.join(self.root, "partials", "head.html"), "<header>v1</header>")
+        self.build_saved()
+        post = os.path.join(self.docs, "blog", "post.html")
+        self.write(post, "untouched")
+        manifest = self.build_saved()
+        self.assertEqual(self.read(post), "untouched")
+        self.write(os.path.join(self.root, "partials", "head.html"), "<header>v2</header>")
+        manifest = self.build_saved()
+        self.assertIn("v2", self.read(post))
+        partial = os.path.join(self.root, "partials", "head.html")
+        source = os.path.join(self.content, "blog", "post.md")
+        self.assertEqual(manifest.pages[source]["reason"], f"{partial} changed")
+        self.assertEqual(len(manifest.dependents(partial)), 2)
+
+    def test_explain(self):
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n[home](/) [gone](/missing)")
+        manifest = self.build_saved()
+        lines = manifest.explain(os.path.join(self.docs, "blog", "post.html"), self.docs)
+        self.assertEqual(lines[1], f"  built from {os.path.join(self.content, 'blog', 'post.md')}")
+        self.assertIn("  last rebuilt because: new page", lines)
+        self.assertIn("    /", lines)
+        self.assertIn("    /missing (missing)", lines)
+        lines = manifest.explain(self.template, self.docs)
+        self.assertEqual(lines[0], f"{self.template} is used by 2 page(s):")
+
+    def test_broken_links_reported(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[post](/blog/post.html) [x](/nope)")
+        self.build(Manifest(self.manifest_path))
+        self.assertEqual(self.broken_links(), [f"Broken link in {os.path.join(self.content, 'index.md')}: /nope"])
+
+    def test_broken_links_checked_incrementally(self):
+        index = os.path.join(self.content, "index.md")
+        post = os.path.join(self.content, "blog", "post.md")
+        self.write(index, "# Home\n\n[post](/blog/post.html) [x](/nope)")
+        self.write(post, "# Post\n\n[new](/new.html)")
+
+        def broken():
+            self.build_saved()
+            return self.broken_links()
+
+        self.assertEqual(broken(), [f"Broken link in {index}: /nope", f"Broken link in {post}: /new.html"])
+        # a build that changes nothing only looks at the links that were broken
+        with mock.patch("link_check.link_target", wraps=link_check.link_target) as link_target:
+            self.assertEqual(broken(), [f"Broken link in {index}: /nope", f"Broken link in {post}: /new.html"])
+        self.assertEqual(sorted(call.args[0] for call in link_target.call_args_list), ["/new.html", "/nope"])
+        # a page appearing fixes the links to it
+        self.write(os.path.join(self.content, "new.md"), "# New")
+        self.assertEqual(broken(), [f"Broken link in {index}: /nope"])
+        # a page going away breaks them, though the page linking to it is fresh
+        os.remove(post)
+        self.assertEqual(broken(), [f"Broken link in {index}: /blog/post.html", f"Broken link in {index}: /nope"])
+        self.assertEqual(Manifest.load(self.manifest_path).removed, set())
+
+    def test_fingerprinted_assets(self):
+        static = os.path.join(self.root, "static")
+        self.write(os.path.join(static, "site.css"), "body {}")
+        self.write(os.path.join(static, "logo.png"), "png")
+        self.write(self.template, '<link href="/site.css">{{ Content }}')
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\n![logo](/logo.png)")
+
+        def build():
+            manifest = Manifest.load(self.manifest_path)
+            sync_tree(static, self.docs, manifest, link=False, fingerprint=True)
+            assets = AssetMap(static, manifest.assets)
+            self.build(manifest, assets=assets)
+            manifest.save()
+            self.assertEqual(self.broken_links(), [])
+            return manifest, assets
+
+        manifest, assets = build()
+        post = self.read(os.path.join(self.docs, "blog", "post.html"))
+        self.assertIn(f'href="{assets.url("/site.css")}"', post)
+        self.assertIn(f'src="{assets.url("/logo.png")}"', post)
+        # only the page that shows the image is rebuilt when the image changes
+        self.write(os.path.join(static, "logo.png"), "new png")
+        manifest, assets = build()
+        source = os.path.join(self.content, "blog", "post.md")
+        self.assertEqual(manifest.pages[source]["reason"], f"{os.path.join(static, 'logo.png')} changed")
+        self.assertIn(assets.url("/logo.png"), self.read(os.path.join(self.docs, "blog", "post.html")))
+        self.assertEqual(manifest.pages[os.path.join(self.content, "index.md")]["reason"], "new page")
+
+    def test_deleted_source_removes_output(self):
+        self.build_saved()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        manifest = self.build_saved()
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog", "post.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+        self.assertEqual(len(manifest.pages), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from frontmatter import split_front_matter
+from mapped_source import has_carriage_returns, map_source, mapped_blocks, mapped_front_matter
+from markdown_blocks import iter_blocks, markdown_to_document, open_page, read_document
+
+
+PAGES = [
+    "",
+    "\n\n\n",
+    "# Title\n\nplain paragraph",
+    "# Title\n\n\n\n\nafter a run of empty lines\n\n",
+    "# Title\n   \nwhitespace-only line\n\t\nagain",
+    "---\ntitle: Front\ntags: [a, b]\n---\n# Title\n\nbody",
+    "---\n\nnot front matter, a rule\n\n# Title",
+    "---\ntitle: never closed\n\n# Title",
+    "# Title\n\n```\ncode\n  indented\n```\n\n\n- one\n- two\n\n> quote",
+    "# Ünïcödé\n\n日本語のテキスト\n\n- é\n",
+]
+
+
+class TestMappedSource(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "page.md")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, data):
+        with open(self.path, "w", newline="") as f:
+            f.write(data)
+
+    def test_blocks_match_text_read(self):
+        for page in PAGES:
+            self.write(page)
+            front_matter, body = split_front_matter(page)
+            expected = [lines for _, lines in iter_blocks(body.split("\n"))]
+            with map_source(self.path) as data:
+                metadata, start = mapped_front_matter(data)
+                self.assertEqual(metadata, front_matter, page)
+                self.assertEqual(list(mapped_blocks(data, start)), expected, page)
+
+    def test_read_document(self):
+        for page in PAGES:
+            self.write(page)
+            document = read_document(self.path)
+            expected = markdown_to_document(page)
+            self.assertEqual((document.title, document.metadata), (expected.title, expected.metadata))
+            self.assertEqual(document.front_matter, expected.front_matter)
+            self.assertEqual(document.node.to_html(), expected.node.to_html())
+
+    def test_carriage_returns_fall_back_to_text(self):
+        self.write("---\r\ntitle: Windows\r\n---\r\n# Title\r\n\r\nbody\r\nline")
+        with map_source(self.path) as data:
+            self.assertTrue(has_carriage_returns(data))
+        with open_page(self.path) as (front_matter, blocks):
+            self.assertEqual(front_matter, {"title": "Windows"})
+            self.assertEqual([lines for _, lines in blocks], [["# Title"], ["body", "line"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,13 @@
+import io
 import unittest
 from markdown_blocks import (
     markdown_to_html_node,
+    markdown_to_document,
     markdown_to_blocks,
     block_to_block_type,
+    iter_blocks,
+    extract_title_from_lines,
+    MarkdownStream,
     BlockType,
 )
 
@@ -163,6 +168,76 @@ the **same** even with inline stuff
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
 
+    def test_code_language(self):
+        md = "```Python title=x.py\nprint(1)\n```\n\n```\nno info\n```"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            '<div><pre><code class="language-python">print(1)\n</code></pre><pre><code>no info\n</code></pre></div>',
+        )
+
+    def test_iter_blocks(self):
+        md = """
+# heading
+
+  This is **bolded** paragraph
+text in a p   
+
+
+
+- This is a list
+- with items
+"""
+        blocks = list(iter_blocks(io.StringIO(md)))
+        self.assertEqual(
+            blocks,
+            [
+                (BlockType.HEADING, ["# heading"]),
+                (BlockType.PARAGRAPH, ["This is **bolded** paragraph", "text in a p"]),
+                (BlockType.ULIST, ["- This is a list", "- with items"]),
+            ],
+        )
+        self.assertEqual(
+            ["\n".join(lines) for block_type, lines in blocks],
+            markdown_to_blocks(md)[:3],
+        )
+
+    def test_markdown_stream(self):
+        md = """
+# Title
+
+> a quote
+
+```
+some code
+```
+
+1. one
+2. two [link](/x)
+"""
+        out = io.StringIO()
+        MarkdownStream(io.StringIO(md)).write_html(out)
+        self.assertEqual(out.getvalue(), markdown_to_html_node(md).to_html())
+
+    def test_extract_title_from_lines(self):
+        lines = iter(["intro\n", "\n", "# The Title \n", "\n", "rest\n"])
+        self.assertEqual(extract_title_from_lines(lines), "The Title")
+        self.assertEqual(next(lines), "rest\n")
+
+    def test_markdown_to_document(self):
+        md = "intro text\n\n# The Title \n\n## Part one\n\n- a\n- b\n\n# Another h1"
+        document = markdown_to_document(md)
+        self.assertEqual(document.title, "The Title")
+        self.assertEqual(
+            document.headings, [(1, "The Title"), (2, "Part one"), (1, "Another h1")]
+        )
+        self.assertEqual(document.metadata, {"blocks": 5, "words": 10})
+        self.assertEqual(document.node.to_html(), markdown_to_html_node(md).to_html())
+
+    def test_markdown_to_document_without_title(self):
+        document = markdown_to_document("## Only a subheading")
+        self.assertIsNone(document.title)
+        self.assertEqual(document.headings, [(2, "Only a subheading")])
+
 
 if __name__ == "__main__":
     unittest.main()
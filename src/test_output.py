@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from output import OutputWriter
+
+
+class TestOutputWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_writes_and_skips_unchanged(self):
+        path = os.path.join(self.root, "a", "b", "page.html")
+        writer = OutputWriter()
+        self.assertTrue(writer.submit(path, b"<p>one</p>").result())
+        self.assertFalse(writer.submit(path, b"<p>one</p>").result())
+        self.assertTrue(writer.submit(path, b"<p>two</p>").result())
+        writer.close()
+        self.assertEqual(self.read(path), b"<p>two</p>")
+        self.assertEqual((writer.written, writer.unchanged), (2, 1))
+        self.assertEqual(writer.dirs, {os.path.join(self.root, "a", "b")})
+
+    def test_atomic_leaves_no_temp_files(self):
+        writer = OutputWriter(atomic=True)
+        futures = [
+            writer.submit(os.path.join(self.root, "out", f"page{i}.html"), f"page {i}".encode())
+            for i in range(10)
+        ]
+        writer.close()
+        for future in futures:
+            future.result()
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, "out"))), sorted(
+            f"page{i}.html" for i in range(10)
+        ))
+
+    def test_atomic_failure_keeps_old_file(self):
+        path = os.path.join(self.root, "page.html")
+        with open(path, "wb") as f:
+            f.write(b"old")
+        writer = OutputWriter(0, atomic=True)
+        with self.assertRaises(ValueError):
+            with writer.open(path) as f:
+                f.write("half")
+                raise ValueError("render failed")
+        self.assertEqual(self.read(path), b"old")
+        self.assertEqual(os.listdir(self.root), ["page.html"])
+
+    def test_inline_errors_are_returned(self):
+        writer = OutputWriter(0)
+        # a directory in the way of the page
+        os.makedirs(os.path.join(self.root, "page.html"))
+        future = writer.submit(os.path.join(self.root, "page.html"), b"x")
+        self.assertIsInstance(future.exception(), OSError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+import parse_cache
+from links import LinkResolver
+from markdown_blocks import markdown_to_html_node
+from parse_cache import ParseCache, block_key, row_size
+
+
+MARKDOWN = """# Title
+
+Some **bold** text and a [link](/about).
+
+- one
+- two
+"""
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache", "parse.sqlite")
+
+    def tearDown(self):
+        parse_cache.disable()
+        self.tmp.cleanup()
+
+    def test_hits_after_flush(self):
+        cache = ParseCache(self.path, version="1")
+        self.assertEqual(cache.get_many(["a"]), {})
+        cache.put("a", "<p>a</p>")
+        cache.flush()
+        cache.close()
+        cache = ParseCache(self.path, version="1")
+        self.assertEqual(cache.get_many(["a", "b"]), {"a": ("<p>a</p>", [], [])})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+    def test_version_change_clears(self):
+        cache = ParseCache(self.path, version="1")
+        cache.connection()
+        cache.put("a", "<p>a</p>")
+        cache.close()
+        cache = ParseCache(self.path, version="2")
+        self.assertEqual(cache.get_many(["a"]), {})
+        cache.close()
+
+    def test_evicts_least_recently_used(self):
+        budget = row_size("old", "12345", "", "") + row_size("new", "1234567", "", "") - 1
+        cache = ParseCache(self.path, version="1", max_bytes=budget)
+        cache.connection()
+        cache.put("old", "12345")
+        cache.flush()
+        cache.put("new", "1234567")
+        cache.flush()
+        # flushes only count; the build's close trims to the budget
+        self.assertEqual(len(cache.get_many(["old", "new"])), 2)
+        cache.close()
+        cache = ParseCache(self.path, version="1", max_bytes=budget)
+        self.assertEqual(cache.get_many(["old", "new"]), {"new": ("1234567", [], [])})
+        self.assertEqual(cache.stats()["bytes"], row_size("new", "1234567", "", ""))
+        cache.close()
+
+    def test_size_stays_bounded(self):
+        cache = ParseCache(self.path, version="1", max_bytes=20000)
+        for build in range(5):
+            cache.connection()
+            for page in range(40):
+                key = f"{build}-{page}"
+                cache.put(key, "<p>" + "x" * 100 + "</p>", ["/a", "/b"], ["some text"])
+                cache.flush()
+            cache.close()
+        conn = cache.connection()
+        stored = sum(row_size(*row) for row in conn.execute("SELECT key, html, links, text FROM blocks"))
+        # the running count matches the rows, which every column is counted for
+        self.assertEqual(cache.stats()["bytes"], stored)
+        self.assertLessEqual(stored, 20000)
+        self.assertGreater(stored, 15000)
+        cache.close()
+
+    def test_salt_changes_key(self):
+        self.assertNotEqual(block_key("text", "/"), block_key("text", "/base/"))
+
+    def test_cached_render_matches(self):
+        resolver = LinkResolver("/base/")
+        expected = markdown_to_html_node(MARKDOWN, resolver).to_html()
+        cache = parse_cache.configure(self.path)
+        self.assertEqual(markdown_to_html_node(MARKDOWN, resolver).to_html(), expected)
+        self.assertEqual(markdown_to_html_node(MARKDOWN, resolver).to_html(), expected)
+        self.assertEqual((cache.hits, cache.misses), (3, 3))
+        # a different basepath must not reuse fragments with rewritten links
+        other = markdown_to_html_node(MARKDOWN, LinkResolver("/")).to_html()
+        self.assertIn('href="/about"', other)
+
+    def test_cached_blocks_report_links(self):
+        parse_cache.configure(self.path)
+        for i in range(2):
+            links = []
+            markdown_to_html_node(MARKDOWN + "![img](/a.png)", LinkResolver("/", links))
+            self.assertEqual(links, ["/about", "/a.png"])
+
+    def test_cached_blocks_report_text(self):
+        parse_cache.configure(self.path)
+        for i in range(2):
+            text = []
+            markdown_to_html_node(MARKDOWN, LinkResolver("/", text=text))
+            self.assertEqual(text, ["Title", "Some bold text and a link.", "one", "two"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import unittest
+from unittest import mock
+
+import build
+from manifest import Manifest
+from shards import merge_manifests, parse_shard, partition, shard_manifest_path
+from site_fixture import SiteTestCase
+
+
+class TestPartition(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for value in ["0/4", "5/4", "1/0", "x", "1/2/3"]:
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_manifest_path(self):
+        self.assertEqual(shard_manifest_path("./.build-manifest.json", (2, 4)), "./.build-manifest.shard2of4.json")
+
+    def test_balanced_by_size(self):
+        sizes = {"huge.md": 1000, "a.md": 300, "b.md": 300, "c.md": 300, "d.md": 100}
+        shards = partition(sizes, 2)
+        self.assertEqual(shards, [["huge.md"], ["a.md", "b.md", "c.md", "d.md"]])
+        self.assertEqual(partition(dict(reversed(list(sizes.items()))), 2), shards)
+
+    def test_every_page_once(self):
+        sizes = {f"page{i}.md": (i * 37) % 11 for i in range(50)}
+        shards = partition(sizes, 4)
+        self.assertEqual(sorted(path for shard in shards for path in shard), sorted(sizes))
+        loads = [sum(sizes[path] for path in shard) for shard in shards]
+        self.assertLessEqual(max(loads) - min(loads), max(sizes.values()))
+
+    def test_more_shards_than_pages(self):
+        self.assertEqual(partition({"a.md": 1}, 3), [["a.md"], [], []])
+
+
+class TestMerge(unittest.TestCase):
+    def manifest(self, path, pages, inputs=None):
+        manifest = Manifest(path, inputs or {"basepath": "/"})
+        for source, output in pages:
+            manifest.record(source, output, {source: "hash"})
+        return manifest
+
+    def test_merge(self):
+        merged = merge_manifests([
+            self.manifest("one", [("a.md", "docs/a.html")]),
+            self.manifest("two", [("b.md", "docs/b.html")]),
+        ], "site.json")
+        self.assertEqual(sorted(merged.pages), ["a.md", "b.md"])
+        self.assertEqual((merged.path, merged.inputs), ("site.json", {"basepath": "/"}))
+
+    def test_overlapping_outputs(self):
+        with self.assertRaisesRegex(ValueError, "docs/a.html is written by both a.md and a/index.md"):
+            merge_manifests([
+                self.manifest("one", [("a.md", "docs/a.html")]),
+                self.manifest("two", [("a/index.md", "docs/a.html")]),
+            ])
+        with self.assertRaisesRegex(ValueError, "more than one shard"):
+            merge_manifests([self.manifest("one", [("a.md", "docs/a.html")])] * 2)
+
+    def test_different_settings(self):
+        with self.assertRaisesRegex(ValueError, "two was built with"):
+            merge_manifests([
+                self.manifest("one", [("a.md", "docs/a.html")]),
+                self.manifest("two", [("b.md", "docs/b.html")], {"basepath": "/blog/"}),
+            ])
+
+
+class TestShardedBuild(SiteTestCase):
+    TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+    def setUp(self):
+        super().setUp()
+        for i in range(7):
+            body = "word " * (10 ** (i % 4))
+            self.write(os.path.join(self.content, f"page{i}.md"), f"# Page {i}\n\n{body}[next](/page{i + 1}.html)")
+
+    def test_shards_cover_the_site(self):
+        full = Manifest()
+        self.build(full, os.path.join(self.root, "full"), log=False)
+        full_out = self.output
+        dest = os.path.join(self.root, "sharded")
+        manifests = [Manifest(str(i)) for i in range(3)]
+        for i, manifest in enumerate(manifests):
+            # links into other shards' pages aren't reported by a shard
+            self.build(manifest, dest, log=False, shard=(i + 1, 3))
+            self.assertEqual(self.output, "")
+        self.assertTrue(all(manifest.pages for manifest in manifests))
+        merged = merge_manifests(manifests)
+        self.assertEqual(sorted(merged.pages), sorted(full.pages))
+        self.assertEqual(sorted(os.listdir(dest)), sorted(os.listdir(os.path.join(self.root, "full"))))
+        self.assertIn("/page7.html", full_out)
+
+    def test_shards_index_only_their_pages(self):
+        # only the merge step sees the whole site
+        manifest = Manifest()
+        with mock.patch.object(build, "build_site_index", wraps=build.build_site_index) as build_site_index:
+            index = self.build(manifest, shard=(1, 2))
+        self.assertIsNone(index)
+        indexed = [from_path for from_path, dest_path in build_site_index.call_args[0][0]]
+        self.assertEqual(sorted(indexed), sorted(manifest.pages))
+
+    def test_page_moving_between_shards(self):
+        manifests = [Manifest(str(i)) for i in range(2)]
+        for i, manifest in enumerate(manifests):
+            self.build(manifest, log=False, shard=(i + 1, 2))
+        before = sorted(manifests[0].pages)
+        # growing a page reshuffles the split; the shard that lost a page
+        # forgets it but leaves its output to the shard that gained it
+        self.write(os.path.join(self.content, "page0.md"), "# Page 0\n\n" + "word " * 5000)
+        for i, manifest in enumerate(manifests):
+            self.build(manifest, log=False, shard=(i + 1, 2))
+        self.assertNotEqual(sorted(manifests[0].pages), before)
+        merged = merge_manifests(manifests)
+        self.assertEqual(len(merged.pages), 7)
+        self.assertEqual(len(os.listdir(self.docs)), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
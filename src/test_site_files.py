@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import unittest
+
+from manifest import Manifest
+from site_files import (
+    feed_xml,
+    page_search,
+    search_index,
+    search_index_json,
+    sitemap_xml,
+    write_site_files,
+)
+from site_fixture import SiteTestCase
+from site_index import SiteIndex
+
+
+def make_index(pages):
+    index = SiteIndex()
+    for source, url, title, metadata, text in pages:
+        index.add(source, url, title, metadata)
+        index.get(source)["search"] = page_search(text)
+    return index
+
+
+class TestSiteFiles(unittest.TestCase):
+    def setUp(self):
+        self.index = make_index([
+            ("index.md", "/", "Home", {}, ["Welcome to the hobbit fan site."]),
+            ("old.md", "/old/", "Old & gold", {"date": "2020-01-02"}, ["Rings of gold."]),
+            ("new.md", "/new/", "New", {"date": "2024-05-06"}, ["A newer post about hobbit feet."]),
+        ])
+
+    def test_page_search(self):
+        search = page_search(["The hobbit and the hobbit hole.", "Rings!"])
+        self.assertEqual(search["terms"], {"hobbit": 2, "hole": 1, "rings": 1})
+        self.assertEqual(search["summary"], "The hobbit and the hobbit hole. Rings!")
+        long = page_search(["word " * 100])["summary"]
+        self.assertTrue(long.endswith("word…"))
+        self.assertLessEqual(len(long), 201)
+
+    def test_sitemap(self):
+        sitemap = sitemap_xml(self.index, "https://example.com/")
+        self.assertIn("<loc>https://example.com/old/</loc>", sitemap)
+        self.assertIn("<lastmod>2020-01-02</lastmod>", sitemap)
+        self.assertEqual(sitemap.count("<url>"), 3)
+
+    def test_feed_newest_dated_pages_first(self):
+        feed = feed_xml(self.index, "https://example.com")
+        self.assertIn("<title>Home</title>", feed)
+        self.assertIn("<description>Welcome to the hobbit fan site.</description>", feed)
+        self.assertLess(feed.index("<title>New</title>"), feed.index("<title>Old &amp; gold</title>"))
+        self.assertEqual(feed.count("<item>"), 2)
+        self.assertIn("<pubDate>Mon, 06 May 2024 00:00:00 +0000</pubDate>", feed)
+
+    def test_search_index(self):
+        data = search_index(self.index)
+        urls = [page[0] for page in data["pages"]]
+        self.assertEqual(urls, ["/", "/new/", "/old/"])
+        # title terms outweigh body terms
+        self.assertEqual(data["terms"]["gold"], [2])
+        self.assertEqual(data["terms"]["hobbit"], [0, 1])
+        self.assertNotIn("the", data["terms"])
+
+    def test_search_index_budget(self):
+        full = search_index_json(self.index)
+        budget = len(full.encode()) - 20
+        small = search_index_json(self.index, budget)
+        self.assertLessEqual(len(small.encode()), budget)
+        self.assertLess(len(json.loads(small)["terms"]), len(json.loads(full)["terms"]))
+
+    def test_write_and_remove(self):
+        with tempfile.TemporaryDirectory() as dest:
+            written = write_site_files(self.index, dest, "/", "https://example.com", True)
+            self.assertEqual(written, ["sitemap.xml", "feed.xml", "search-index.json"])
+            # a static file of the same name is left alone
+            manifest = Manifest(assets={"feed.xml": {}})
+            written = write_site_files(self.index, dest, "/", None, True, manifest)
+            self.assertEqual(written, ["search-index.json"])
+            self.assertEqual(sorted(os.listdir(dest)), ["feed.xml", "search-index.json"])
+
+
+class TestCollectedWhileRendering(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manifest = Manifest(os.path.join(self.root, "manifest.json"))
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nAll about **hobbits**.\n\n- [second](/b)")
+        self.write(os.path.join(self.content, "b.md"), "# B\n\n![alt](/x.png)\n\nSecond page.")
+
+    def test_text_from_render(self):
+        index = self.build(self.manifest, search=True)
+        home = index.get(os.path.join(self.content, "index.md"))
+        self.assertEqual(home["search"]["summary"], "All about hobbits. second")
+        self.assertEqual(index.get(os.path.join(self.content, "b.md"))["search"]["summary"], "Second page.")
+        # pages the next build skips keep what their last render recorded
+        index = self.build(self.manifest, search=True)
+        self.assertEqual(index.get(os.path.join(self.content, "index.md"))["search"], home["search"])
+
+    def test_text_only_when_searched(self):
+        source = os.path.join(self.content, "index.md")
+        index = self.build(self.manifest)
+        self.assertIsNone(index.get(source)["search"])
+        # turning search on rebuilds the pages that have no entry yet
+        index = self.build(self.manifest, search=True)
+        self.assertEqual(self.manifest.pages[source]["reason"], "search changed")
+        self.assertEqual(index.get(source)["search"]["summary"], "All about hobbits. second")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import io
+import os
+import tempfile
+import unittest
+
+from links import LinkResolver
+from template import compile_template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render(self):
+        template = compile_template("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(
+            template.render({"Title": "Hi", "Content": "<p>body</p>"}),
+            "<title>Hi</title><main><p>body</p></main>",
+        )
+
+    def test_static_urls_rewritten_once(self):
+        template = compile_template(
+            '<link href="/index.css" /><img src="/logo.png" />{{ Content }}',
+            "/site/",
+        )
+        self.assertEqual(
+            template.render({"Content": '<a href="/raw">x</a>'}),
+            '<link href="/site/index.css" /><img src="/site/logo.png" /><a href="/raw">x</a>',
+        )
+
+    def test_extra_and_unknown_placeholders(self):
+        template = compile_template("{{Basepath}}|{{ Title }}|{{ Missing }}")
+        self.assertEqual(
+            template.render({"Basepath": "/b/", "Title": "T"}),
+            "/b/|T|{{ Missing }}",
+        )
+
+    def test_repeated_placeholder(self):
+        template = compile_template("{{ Title }} - {{ Title }}")
+        self.assertEqual(template.render({"Title": "A"}), "A - A")
+
+    def test_write(self):
+        template = compile_template("<h1>{{ Title }}</h1>")
+        out = io.StringIO()
+        template.write(out, {"Title": "Streamed"})
+        self.assertEqual(out.getvalue(), "<h1>Streamed</h1>")
+
+    def test_load_template_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as f:
+                f.write("{{ Title }}")
+            first = load_template(path, "/")
+            self.assertIs(load_template(path, "/"), first)
+            self.assertIsNot(load_template(path, "/other/"), first)
+            with open(path, "w") as f:
+                f.write("new {{ Title }}")
+            self.assertEqual(load_template(path, "/").render({"Title": "x"}), "new x")
+
+    def test_includes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "partials"))
+            path = os.path.join(tmp, "template.html")
+            nav = os.path.join(tmp, "partials", "nav.html")
+            link = os.path.join(tmp, "partials", "link.html")
+            with open(path, "w") as f:
+                f.write("<nav>{{> partials/nav.html }}</nav>{{ Content }}")
+            with open(nav, "w") as f:
+                f.write('{{> link.html }}|{{ Title }}')
+            with open(link, "w") as f:
+                f.write('<a href="/">home</a>')
+            template = load_template(path, "/site/")
+            self.assertEqual(
+                template.render({"Title": "T", "Content": "c"}),
+                '<nav><a href="/site/">home</a>|T</nav>c',
+            )
+            self.assertEqual(template.dependencies, [path, nav, link])
+            with open(link, "w") as f:
+                f.write("changed")
+            self.assertEqual(load_template(path, "/site/").render({}), "<nav>changed|{{ Title }}</nav>{{ Content }}")
+            with open(link, "w") as f:
+                f.write("{{> ../template.html }}")
+            with self.assertRaises(ValueError):
+                load_template(path, "/site/")
+
+    def test_link_resolver(self):
+        resolver = LinkResolver("/site/")
+        self.assertEqual(resolver.url("/blog/tom"), "/site/blog/tom")
+        self.assertEqual(resolver.url("https://boot.dev"), "https://boot.dev")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import contextlib
+import io
+import os
+import unittest
+from unittest import mock
+
+from manifest import Manifest
+from site_fixture import SiteTestCase
+from watch import Watcher, changed_paths, snapshot
+
+
+class TestWatch(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.root, "static")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post\n\nworld")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.manifest = Manifest(os.path.join(self.root, "manifest.json"))
+        index = self.build(self.manifest)
+        self.watcher = Watcher(
+            self.content, self.static, self.template, self.docs, "/", self.manifest, log=False, index=index
+        )
+        self.post = os.path.join(self.docs, "blog", "post.html")
+        self.write(self.post, "untouched")
+
+    def test_changed_paths(self):
+        before = {"a": (1, 1), "b": (1, 1)}
+        after = {"a": (2, 1), "c": (1, 1)}
+        self.assertEqual(changed_paths(before, after), (["a", "c"], ["b"]))
+
+    def test_snapshot(self):
+        files = snapshot(self.content)
+        self.assertEqual(
+            sorted(files),
+            sorted([os.path.join(self.content, "index.md"), os.path.join(self.content, "blog", "post.md")]),
+        )
+        self.assertEqual(snapshot(os.path.join(self.content, "missing")), {})
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.watcher.poll(), 0)
+
+    def test_only_changed_page_rendered(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nedited")
+        self.assertEqual(self.watcher.poll(), 1)
+        self.assertIn("edited", self.read(os.path.join(self.docs, "index.html")))
+        self.assertEqual(self.read(self.post), "untouched")
+
+    def test_new_and_removed_pages(self):
+        self.write(os.path.join(self.content, "new.md"), "# New\n\npage")
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.assertEqual(self.watcher.poll(), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "new.html")))
+        self.assertFalse(os.path.exists(self.post))
+        self.assertNotIn(os.path.join(self.content, "blog", "post.md"), self.manifest.pages)
+
+    def test_index_follows_pages(self):
+        source = os.path.join(self.content, "new.md")
+        self.write(source, "# New\n\npage")
+        self.watcher.poll()
+        self.assertEqual((self.watcher.index.get(source)["title"], self.watcher.index.get(source)["url"]), ("New", "/new.html"))
+        os.remove(source)
+        self.watcher.poll()
+        self.assertIsNone(self.watcher.index.get(source))
+
+    def test_static_change_copies_asset(self):
+        self.write(os.path.join(self.static, "images", "logo.png"), "png")
+        self.assertEqual(self.watcher.poll(), 1)
+        self.assertEqual(self.read(os.path.join(self.docs, "images", "logo.png")), "png")
+        self.assertEqual(self.read(self.post), "untouched")
+
+    def test_template_change_rebuilds_everything(self):
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.watcher.poll()
+        self.assertTrue(self.read(self.post).startswith("<h1>Post</h1>"))
+
+    def test_manifest_saved_once_edits_stop(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nedited")
+        with mock.patch.object(self.manifest, "save") as save:
+            self.assertEqual(self.watcher.poll(), 1)
+            # an edit is served without waiting for the manifest
+            save.assert_not_called()
+            self.assertFalse(self.watcher.save_manifest())
+            self.assertTrue(self.watcher.save_manifest(0))
+            self.assertFalse(self.watcher.save_manifest(0))
+        save.assert_called_once()
+
+    def test_manifest_saved_when_watch_stops(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nedited")
+        with mock.patch.object(self.manifest, "save") as save, \
+                mock.patch("time.sleep", side_effect=[None, KeyboardInterrupt]):
+            self.watcher.watch()
+        save.assert_called_once()
+        self.assertIn("edited", self.read(os.path.join(self.docs, "index.html")))
+
+    def test_broken_page_does_not_stop_watch(self):
+        self.write(os.path.join(self.content, "index.md"), "no title yet")
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(self.watcher.poll(), 0)
+        self.assertIn("Error rebuilding", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
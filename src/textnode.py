@@ -12,6 +12,8 @@ class TextType(Enum):
 
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
@@ -28,7 +30,7 @@ class TextNode:
         return f"TextNode({self.text}, {self.text_type.value}, {self.url})"
 
 
-def text_node_to_html_node(text_node):
+def text_node_to_html_node(text_node, resolver=None):
     if text_node.text_type == TextType.TEXT:
         return LeafNode(None, text_node.text)
     if text_node.text_type == TextType.BOLD:
@@ -38,7 +40,12 @@ def text_node_to_html_node(text_node):
     if text_node.text_type == TextType.CODE:
         return LeafNode("code", text_node.text)
     if text_node.text_type == TextType.LINK:
-        return LeafNode("a", text_node.text, {"href": text_node.url})
+        url = text_node.url if resolver is None else resolver.url(text_node.url)
+        return LeafNode("a", text_node.text, {"href": url})
     if text_node.text_type == TextType.IMAGE:
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+        if resolver is None:
+            return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+        props = {"src": resolver.url(text_node.url), "alt": text_node.text}
+        props.update(resolver.image_props(text_node.url))
+        return LeafNode("img", "", props)
     raise ValueError(f"invalid text type: {text_node.text_type}")
@@ -0,0 +1,203 @@
+import os
+import time
+
+from assets import AssetMap, sync_file, sync_tree
+from compress import precompress_tree
+from discover import IGNORE_PATTERNS, walk_files
+from manifest import file_hash, remove_output
+from build import generate_pages_recursive, page_dest_path, scan_page, template_inputs, write_pages
+from site_index import page_url
+from template import load_template
+
+# Writing the manifest of a large site takes longer than rebuilding a page,
+# so the watcher saves it once edits have stopped for this many seconds, and
+# when it stops, rather than after every poll.
+SAVE_DELAY = 1.0
+
+
+def snapshot(root, ignore=IGNORE_PATTERNS):
+    # {path: (mtime_ns, size)} for every file under root; saving a file in an
+    # editor doesn't trigger rebuilds for its swap files
+    files = {}
+    for entry in walk_files(root, ignore=ignore):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        files[os.path.normpath(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def changed_paths(before, after):
+    changed = sorted(path for path, signature in after.items() if before.get(path) != signature)
+    removed = sorted(path for path in before if path not in after)
+    return changed, removed
+
+
+class Watcher:
+    def __init__(self, content_dir, static_dir, template_path, dest_dir, basepath, manifest=None, link=False, log=True,
+                 assets=None, fingerprint=False, images=None, precompress=False, ignore=IGNORE_PATTERNS, search=False,
+                 index=None):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.dest_dir = dest_dir
+        self.basepath = basepath
+        self.manifest = manifest
+        self.link = link
+        self.log = log
+        # an AssetMap when assets are fingerprinted or images processed;
+        # both need a manifest
+        self.assets = assets
+        self.fingerprint = fingerprint
+        self.images = images
+        self.precompress = precompress
+        self.ignore = ignore
+        # pages keep a search entry when the build they continue recorded one
+        self.search = search
+        # the build's SiteIndex, kept up to date for the pages rendered here
+        self.index = index
+        # when the last change the saved manifest doesn't have was made
+        self.last_change = None
+        self.content = snapshot(content_dir, ignore)
+        self.static = snapshot(static_dir, ignore)
+        self.template_files = self.load_template_files()
+        self.template = self.template_signature()
+
+    def poll(self):
+        # Rebuilds whatever changed since the last poll; returns how many
+        # pages and assets were touched.
+        touched = 0
+        template = self.template_signature()
+        if template != self.template:
+            self.template_files = self.load_template_files()
+            self.template = self.template_signature()
+            self.content = snapshot(self.content_dir, self.ignore)
+            touched += self.rebuild_all()
+        else:
+            content = snapshot(self.content_dir, self.ignore)
+            changed, removed = changed_paths(self.content, content)
+            self.content = content
+            for path in changed:
+                if path.endswith(".md"):
+                    touched += self.run(self.render_page, path)
+            for path in removed:
+                if path.endswith(".md"):
+                    touched += self.run(self.remove_page, path)
+        static = snapshot(self.static_dir, self.ignore)
+        changed, removed = changed_paths(self.static, static)
+        self.static = static
+        if self.assets is not None and (changed or removed):
+            # a new fingerprint or image size changes every page that uses the asset
+            touched += self.run(self.resync_assets, self.static_dir)
+            changed = removed = []
+        for path in changed + removed:
+            touched += self.run(self.sync_asset, path)
+        if touched and self.precompress:
+            precompress_tree(self.dest_dir, self.manifest)
+        if touched:
+            self.last_change = time.monotonic()
+        return touched
+
+    def save_manifest(self, delay=SAVE_DELAY):
+        # Saves the manifest once nothing has changed for delay seconds;
+        # returns whether it did.
+        if self.manifest is None or self.last_change is None:
+            return False
+        if time.monotonic() - self.last_change < delay:
+            return False
+        self.manifest.save()
+        self.last_change = None
+        return True
+
+    def load_template_files(self):
+        # the template and its partials; editing any of them rebuilds every page
+        try:
+            return load_template(self.template_path, self.basepath, self.assets).dependencies
+        except Exception:
+            return [self.template_path]
+
+    def template_signature(self):
+        return [file_signature(path) for path in self.template_files]
+
+    def run(self, action, path):
+        # a half-typed page must not take the watcher down
+        start = time.perf_counter()
+        try:
+            action(path)
+        except Exception as e:
+            print(f"Error rebuilding {path}: {e}")
+            return 0
+        if self.log:
+            print(f"{action.__name__.replace('_', ' ')}: {path} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        return 1
+
+    def render_page(self, path):
+        dest_path = page_dest_path(path, self.content_dir, self.dest_dir)
+        deps = {path: file_hash(path)}
+        deps.update(template_inputs(self.template_path, self.basepath, self.assets))
+        pages = [(path, dest_path, deps, f"{path} changed")]
+        if self.index is not None:
+            title, front_matter = scan_page(path)
+            self.index.add(path, page_url(dest_path, self.dest_dir, self.basepath), title, front_matter)
+        write_pages(pages, self.template_path, self.basepath, self.manifest, False, assets=self.assets, search=self.search,
+                    index=self.index)
+
+    def remove_page(self, path):
+        dest_path = page_dest_path(path, self.content_dir, self.dest_dir)
+        if self.manifest is not None:
+            entry = self.manifest.forget(path)
+            if entry is not None:
+                dest_path = entry["output"]
+        if self.index is not None:
+            self.index.remove(path)
+        if self.manifest is not None:
+            self.manifest.remove_output(dest_path, self.dest_dir)
+        else:
+            remove_output(dest_path, self.dest_dir)
+
+    def sync_asset(self, path):
+        sync_file(self.static_dir, self.dest_dir, os.path.relpath(path, self.static_dir), self.manifest, self.link)
+
+    def resync_assets(self, path):
+        sync_tree(self.static_dir, self.dest_dir, self.manifest, link=self.link, fingerprint=self.fingerprint, images=self.images,
+                  ignore=self.ignore)
+        self.assets = AssetMap(self.static_dir, self.manifest.assets)
+        self.index = generate_pages_recursive(
+            self.content_dir, self.template_path, self.dest_dir, self.basepath, self.manifest, log=False, assets=self.assets,
+            ignore=self.ignore, search=self.search
+        )
+
+    def rebuild_all(self):
+        if self.log:
+            print(f"{self.template_path} changed, rebuilding every page")
+        try:
+            self.index = generate_pages_recursive(
+                self.content_dir, self.template_path, self.dest_dir, self.basepath, self.manifest, log=False, assets=self.assets,
+                ignore=self.ignore, search=self.search
+            )
+        except Exception as e:
+            print(f"Error rebuilding: {e}")
+            return 0
+        return 1
+
+    def watch(self, interval=0.1):
+        if self.log:
+            print(f"Watching {self.content_dir}, {self.static_dir} and {self.template_path} (Ctrl-C to stop)")
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+                self.save_manifest()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.save_manifest(0)